@@ -7,3 +7,14 @@
 # ----------------------------------------------------------------------------
 
 __version__ = "0.1.0"
+
+__all__ = ["summarize"]
+
+
+def __getattr__(name):
+    # imported on first use, for the command line
+    # not to wait for pandas to be imported
+    if name == "summarize":
+        from Xplor_distros._xplor_summary import summarize
+        return summarize
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,379 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import os
+import json
+import hashlib
+import zipfile
+import numpy as np
+import pandas as pd
+from os.path import abspath, isdir, isfile
+
+# to increment whenever the content of the cache entries changes,
+# so that the entries written by previous versions are not read
+cache_version = 3
+
+# errors of a cache entry that cannot be read (e.g. truncated)
+unreadable_errors = (OSError, ValueError, KeyError, zipfile.BadZipFile)
+
+
+def get_cache_key(md_fp: str, params: tuple = ()) -> str:
+    """
+    Get the key of a metadata file in the cache, which changes
+    whenever the file is modified (path, modification time and
+    size), is read with different parameters or when the cache
+    format changes (cache_version).
+
+    Parameters
+    ----------
+    md_fp : str
+        Metadata file path.
+    params : tuple
+        Parameters used to read the metadata file.
+
+    Returns
+    -------
+    key : str
+        Hash for the metadata file in the cache.
+    """
+    stat = os.stat(md_fp)
+    to_hash = json.dumps([cache_version, abspath(md_fp), stat.st_mtime_ns,
+                          stat.st_size, list(params)])
+    key = hashlib.sha1(to_hash.encode('utf-8')).hexdigest()
+    return key
+
+
+def get_table_arrays(table: pd.DataFrame, name: str) -> tuple:
+    """
+    Split a table into numpy arrays that are stored without pickling:
+    one 2D block per numeric dtype, and for the other columns (strings,
+    categories), one 2D block of integer codes with the categories
+    of each column in the layout (JSON).
+
+    Parameters
+    ----------
+    table : pd.DataFrame
+        Table to store.
+    name : str
+        Prefix of the arrays names (to store several tables together).
+
+    Returns
+    -------
+    arrays : dict
+        Key     = Array name.
+        Value   = Numeric block or codes.
+    layout : dict
+        Columns, index and, per column, how it is stored.
+    """
+    blocks, codes, columns = {}, [], []
+    for column in table.columns:
+        series = table[column]
+        dtype = series.dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biuf':
+            blocks.setdefault(dtype.name, []).append(series.to_numpy())
+            columns.append([column, dtype.name, None])
+        else:
+            if isinstance(dtype, pd.CategoricalDtype):
+                column_codes = series.cat.codes.to_numpy()
+                categories = [series.cat.categories.tolist(), dtype.ordered]
+            else:
+                column_codes, uniques = pd.factorize(series)
+                categories = [uniques.tolist(), None]
+            codes.append(column_codes.astype('int64'))
+            columns.append([column, str(dtype), categories])
+    arrays = dict(('%s%s' % (name, dtype), np.column_stack(block))
+                  for dtype, block in blocks.items())
+    if codes:
+        arrays['%scodes' % name] = np.column_stack(codes)
+    if isinstance(table.index, pd.RangeIndex):
+        index = None
+    else:
+        index = table.index.tolist()
+    layout = {'name': name, 'rows': table.shape[0], 'columns': columns,
+              'index': index, 'index_name': table.index.name}
+    return arrays, layout
+
+
+def get_table(arrays, layout: dict) -> pd.DataFrame:
+    """
+    Rebuild a table from its numpy arrays (see get_table_arrays).
+
+    Parameters
+    ----------
+    arrays : dict or np.lib.npyio.NpzFile
+        Key     = Array name.
+        Value   = Numeric block or codes.
+    layout : dict
+        Columns, index and, per column, how it is stored.
+
+    Returns
+    -------
+    table : pd.DataFrame
+        Stored table.
+    """
+    name = layout['name']
+    if layout['index'] is None:
+        index = pd.RangeIndex(layout['rows'], name=layout['index_name'])
+    else:
+        index = pd.Index(layout['index'], name=layout['index_name'])
+    positions, data = {}, {}
+    for column, dtype, categories in layout['columns']:
+        block = 'codes' if categories else dtype
+        position = positions.get(block, 0)
+        positions[block] = position + 1
+        values = arrays['%s%s' % (name, block)][:, position]
+        if not categories:
+            data[column] = values
+        elif dtype == 'category':
+            data[column] = pd.Categorical.from_codes(
+                values, categories[0], ordered=categories[1])
+        else:
+            data[column] = pd.Series(pd.Categorical.from_codes(
+                values, categories[0]), index=index).astype(object).astype(dtype)
+    table = pd.DataFrame(data, index=index,
+                         columns=[x[0] for x in layout['columns']])
+    return table
+
+
+def write_arrays(arrays: dict, layout, cache_fp: str) -> None:
+    """
+    Write arrays (.npz) and their layout (.json) in the cache,
+    under temporary names so that concurrent runs never read
+    a partially written cache entry.
+
+    Parameters
+    ----------
+    arrays : dict
+        Key     = Array name.
+        Value   = Numeric block or codes.
+    layout
+        JSON-serializable description of the arrays.
+    cache_fp : str
+        Path of the cache entry (without extension).
+    """
+    tmp = '.tmp%s' % os.getpid()
+    with open('%s.npz%s' % (cache_fp, tmp), 'wb') as o:
+        np.savez(o, **arrays)
+    with open('%s.json%s' % (cache_fp, tmp), 'w') as o:
+        json.dump(layout, o, default=lambda x: x.item() if hasattr(x, 'item') else str(x))
+    os.replace('%s.npz%s' % (cache_fp, tmp), '%s.npz' % cache_fp)
+    os.replace('%s.json%s' % (cache_fp, tmp), '%s.json' % cache_fp)
+
+
+def read_arrays(cache_fp: str) -> tuple:
+    """
+    Read arrays and their layout from the cache (see write_arrays).
+
+    Parameters
+    ----------
+    cache_fp : str
+        Path of the cache entry (without extension).
+
+    Returns
+    -------
+    arrays : dict
+        Key     = Array name.
+        Value   = Numeric block or codes.
+    layout
+        JSON description of the arrays.
+    """
+    with open('%s.json' % cache_fp) as f:
+        layout = json.load(f)
+    # no pickled objects are loaded (hence no code is run)
+    with np.load('%s.npz' % cache_fp, allow_pickle=False) as npz:
+        arrays = dict(npz.items())
+    return arrays, layout
+
+
+def read_cache(cache_dir: str, md_fp: str, params: tuple = ()) -> tuple:
+    """
+    Read the metadata table and its variables' dtypes from the cache.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Cache folder.
+    md_fp : str
+        Metadata file path.
+    params : tuple
+        Parameters used to read the metadata file.
+
+    Returns
+    -------
+    md : pd.DataFrame
+        Metadata table (None if not in the cache).
+    dtypes : dict
+        Metadata variables' dtypes (None if not in the cache).
+    """
+    key = get_cache_key(md_fp, params)
+    md_cache = '%s/%s-md' % (cache_dir, key)
+    dtypes_json = '%s/%s.json' % (cache_dir, key)
+    if not isfile('%s.npz' % md_cache) or not isfile(dtypes_json):
+        return None, None
+    try:
+        arrays, layout = read_arrays(md_cache)
+        md = get_table(arrays, layout)
+        with open(dtypes_json) as f:
+            dtypes = json.load(f)
+    except unreadable_errors:
+        return None, None
+    return md, dtypes
+
+
+def write_cache(cache_dir: str, md_fp: str, md: pd.DataFrame,
+                dtypes: dict, params: tuple = ()) -> None:
+    """
+    Write the metadata table (numpy blocks of its typed columns)
+    and its variables' dtypes in the cache.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Cache folder.
+    md_fp : str
+        Metadata file path.
+    md : pd.DataFrame
+        Metadata table.
+    dtypes : dict
+        Metadata variables' dtypes.
+    params : tuple
+        Parameters used to read the metadata file.
+    """
+    if not isdir(cache_dir):
+        os.makedirs(cache_dir)
+    key = get_cache_key(md_fp, params)
+    write_arrays(*get_table_arrays(md, ''), '%s/%s-md' % (cache_dir, key))
+    dtypes_json = '%s/%s.json' % (cache_dir, key)
+    with open('%s.tmp%s' % (dtypes_json, os.getpid()), 'w') as o:
+        json.dump(dtypes, o)
+    os.replace('%s.tmp%s' % (dtypes_json, os.getpid()), dtypes_json)
+
+
+def read_figures_cache(cache_dir: str, md_fp: str, params: tuple = ()) -> tuple:
+    """
+    Read the figures data of a metadata file (and its
+    variables' dtypes) from the cache.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Cache folder.
+    md_fp : str
+        Metadata file path.
+    params : tuple
+        Parameters used to make the figures data.
+
+    Returns
+    -------
+    figures : list
+        One (title, figure table, binned table) tuple per row
+        of figures (None if not in the cache).
+    logs : list
+        List of lists: each nested list is:
+            [variable, metadata file path, warning message, a number]
+    dtypes : dict
+        Metadata variables' dtypes.
+    """
+    figures_fp = '%s/figures-%s' % (cache_dir, get_cache_key(md_fp, params))
+    if not isfile('%s.npz' % figures_fp) or not isfile('%s.json' % figures_fp):
+        return None, None, None
+    try:
+        arrays, layout = read_arrays(figures_fp)
+        figures = []
+        for title, figure_layout, binned_layout in layout['figures']:
+            binned_md = None
+            if binned_layout is not None:
+                binned_md = get_table(arrays, binned_layout)
+            figures.append((title, get_table(arrays, figure_layout), binned_md))
+        logs, dtypes = layout['logs'], layout['dtypes']
+    except unreadable_errors:
+        return None, None, None
+    return figures, logs, dtypes
+
+
+def write_figures_cache(cache_dir: str, md_fp: str, figures: list,
+                        logs: list, dtypes: dict, params: tuple = ()) -> None:
+    """
+    Write the figures data of a metadata file in the cache.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Cache folder.
+    md_fp : str
+        Metadata file path.
+    figures : list
+        One (title, figure table, binned table) tuple per row of figures.
+    logs : list
+        List of lists: each nested list is:
+            [variable, metadata file path, warning message, a number]
+    dtypes : dict
+        Metadata variables' dtypes.
+    params : tuple
+        Parameters used to make the figures data.
+    """
+    if not isdir(cache_dir):
+        os.makedirs(cache_dir)
+    arrays, figures_layouts = {}, []
+    for row, (title, figure_tab, binned_md) in enumerate(figures):
+        figure_arrays, figure_layout = get_table_arrays(figure_tab, '%s-figure-' % row)
+        arrays.update(figure_arrays)
+        binned_layout = None
+        if binned_md is not None:
+            binned_arrays, binned_layout = get_table_arrays(binned_md, '%s-bins-' % row)
+            arrays.update(binned_arrays)
+        figures_layouts.append([title, figure_layout, binned_layout])
+    layout = {'figures': figures_layouts, 'logs': logs, 'dtypes': dtypes}
+    figures_fp = '%s/figures-%s' % (cache_dir, get_cache_key(md_fp, params))
+    write_arrays(arrays, layout, figures_fp)
+
+
+def read_manifest(cache_dir: str) -> dict:
+    """
+    Read the manifest of the visualization files written
+    by the previous runs using the same cache folder.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Cache folder.
+
+    Returns
+    -------
+    manifest : dict
+        Key     = Visualization file path.
+        Value   = Fingerprint of the figures it shows and names
+                  of the data files it reads.
+    """
+    manifest_json = '%s/manifest.json' % cache_dir
+    if not isfile(manifest_json):
+        return {}
+    with open(manifest_json) as f:
+        manifest = json.load(f)
+    return manifest
+
+
+def write_manifest(cache_dir: str, manifest: dict) -> None:
+    """
+    Write the manifest of the visualization files.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Cache folder.
+    manifest : dict
+        Key     = Visualization file path.
+        Value   = Fingerprint of the figures it shows and names
+                  of the data files it reads.
+    """
+    if not isdir(cache_dir):
+        os.makedirs(cache_dir)
+    manifest_json = '%s/manifest.json' % cache_dir
+    with open('%s.tmp%s' % (manifest_json, os.getpid()), 'w') as o:
+        json.dump(manifest, o, indent=1, sort_keys=True)
+    os.replace('%s.tmp%s' % (manifest_json, os.getpid()), manifest_json)
@@ -6,11 +6,123 @@
 # The full license is in the file LICENSE, distributed with this software.
 # ----------------------------------------------------------------------------
 
-from Xplor_distros._xplor_md import get_metadata_files
-from Xplor_distros._xplor_dtypes import get_dtypes, split_variables_types
-from Xplor_distros._xplot_strata import get_stratification
-from Xplor_distros._xplor_plot import make_plots
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+from Xplor_distros._xplor_cache import (
+    read_figures_cache, write_figures_cache, read_manifest, write_manifest)
+from Xplor_distros._xplor_summary import (
+    prepare_metadata, get_approx_stats, get_schema_placeholders)
+from Xplor_distros._xplor_dtypes import get_dtypes_conflicts
+from Xplor_distros._xplor_schema import get_schema, write_schema
+from Xplor_distros._xplor_plot import get_figures, plot_figures
 from Xplor_distros._xplor_logs import show_log
+from Xplor_distros._xplor_profile import profile_stage, show_profile, write_profile
+
+
+def xplor_metadata(
+        md_fp: str,
+        stratify: tuple,
+        number_of_samples: int,
+        max_strata: int,
+        merge: bool,
+        aggregate: bool = False,
+        chunksize: int = None,
+        max_rows: int = None,
+        cache_dir: str = None,
+        seed: int = None,
+        approx: bool = False,
+        profile: bool = False,
+        schema: dict = None,
+        na_values: list = None) -> tuple:
+    """
+    Prepare the data of the distributions visualizations
+    for the numeric variables in one metadata file.
+
+    Parameters
+    ----------
+    md_fp : str
+        Path to the metadata file for which to make visualizations.
+    stratify : tuple
+        Metadata variables on which to split the visualizations.
+    number_of_samples : int
+        Number of samples to randomly select to compute the distributions.
+    max_strata : int
+        Maximum number of stratification to create.
+    merge : bool
+        Whether to merge multiple stratification variables or not.
+    aggregate : bool
+        Whether to pre-compute the histograms instead of
+        embedding the samples values in the visualization.
+    chunksize : int
+        Number of rows per chunk to stream the metadata file
+        (only the numeric and stratification variables are kept).
+    max_rows : int
+        Maximum number of randomly selected rows to keep
+        when streaming by chunks.
+    cache_dir : str
+        Folder where to cache the typed metadata table and
+        the figures data.
+    seed : int
+        Seed for the random rows and samples selections.
+    approx : bool
+        Whether to stream the statistics of all the rows through
+        mergeable accumulators (exact moments, approximate medians).
+    profile : bool
+        Whether to record the time and memory used by each stage.
+    schema : dict
+        Types of the variables and missing values placeholders
+        (see _xplor_schema.read_schema), to skip the inference.
+    na_values : list
+        Placeholders of missing values (see _xplor_dtypes.get_nan_values).
+
+    Returns
+    -------
+    figures : list
+        One (title, figure table, binned table) tuple per row of figures.
+    logs : list
+        List of lists: each nested list is:
+            [variable, metadata file path, warning message, a number]
+    profile : list
+        List of lists (see _xplor_profile.profile_stage),
+        or None if the stages were not profiled.
+    md_dtypes : dict
+        Key     = Metadata variable.
+        Value   = dtype
+    """
+    logs = []
+    profile = [] if profile else None
+    figures_params = ('figures', list(stratify), number_of_samples, max_strata,
+                      merge, aggregate, chunksize, max_rows, seed, approx, schema,
+                      na_values)
+    if cache_dir:
+        # Skip everything if the file and the parameters are unchanged
+        with profile_stage(profile, 'read_figures_cache', md_fp) as record:
+            figures, figures_logs, md_dtypes = read_figures_cache(
+                cache_dir, md_fp, figures_params)
+            if figures is not None:
+                record['rows'] = len(figures)
+        if figures is not None:
+            return figures, figures_logs, profile, md_dtypes
+
+    # Read, type and stratify the metadata table
+    md, md_dtypes, numerical, categorical, stratas = prepare_metadata(
+        md_fp, stratify, max_strata, merge, logs, chunksize,
+        max_rows, cache_dir, seed, profile, schema, na_values)
+    figures = []
+    if stratas:
+        stats = None
+        if approx:
+            with profile_stage(profile, 'get_approx_stats', md_fp) as record:
+                stats = get_approx_stats(md_fp, md, stratas, numerical, categorical,
+                                         stratify, chunksize, seed, na_values)
+                record['rows'], record['columns'] = stats.shape
+        figures = get_figures(md_fp, md, stratas, numerical, number_of_samples,
+                              logs, aggregate, seed, stats, profile)
+    if cache_dir:
+        write_figures_cache(cache_dir, md_fp, figures, logs,
+                            md_dtypes, figures_params)
+    return figures, logs, profile, md_dtypes
 
 
 def xplor_distros(
@@ -19,7 +131,22 @@ def xplor_distros(
         number_of_samples: int,
         distributions: str,
         max_strata: int,
-        merge: bool) -> None:
+        merge: bool,
+        aggregate: bool = False,
+        chunksize: int = None,
+        max_rows: int = None,
+        cache_dir: str = None,
+        split: bool = False,
+        data_format: str = None,
+        seed: int = None,
+        approx: bool = False,
+        profile: bool = False,
+        profile_fp: str = None,
+        schema: str = None,
+        schema_out: str = None,
+        nan_values: tuple = None,
+        nan_values_fp: str = None,
+        jobs: int = 1) -> None:
     """
     Main script preparing the distributions visualizations
     for the numeric variables in a metadata file.
@@ -38,18 +165,90 @@ def xplor_distros(
         Maximum number of stratification to create.
     merge : bool
         Whether to merge multiple stratification variables or not.
+    aggregate : bool
+        Whether to pre-compute the histograms instead of
+        embedding the samples values in the visualization.
+    chunksize : int
+        Number of rows per chunk to stream the metadata files
+        (only the numeric and stratification variables are kept).
+    max_rows : int
+        Maximum number of randomly selected rows to keep
+        per metadata file when streaming by chunks.
+    cache_dir : str
+        Folder where to cache the typed metadata tables, the figures
+        data and the manifest of the written visualizations.
+    split : bool
+        Whether to write one visualization per metadata file and
+        stratification, loaded on demand from an index page.
+    data_format : str
+        Format of the external data files ("json" or "csv"),
+        or None to embed the data in the visualization(s).
+    seed : int
+        Seed for the random rows and samples selections.
+    approx : bool
+        Whether to stream the statistics of all the rows through
+        mergeable accumulators (exact moments, approximate medians).
+    profile : bool
+        Whether to show the time and memory used by each stage.
+    profile_fp : str
+        Path to a JSON file where to write the time and memory
+        used by each stage (also activates the profiling).
+    schema : str
+        Path to a schema file giving the type of the variables and
+        the missing values placeholders, to skip the inference.
+    schema_out : str
+        Path to the schema file to write from the inferred types,
+        for reuse with the schema option.
+    nan_values : tuple
+        Placeholders of missing values, matched case-insensitively
+        and read as NaN (default: "Unknown", "Not applicable", etc),
+        added to those of the schema if any.
+    nan_values_fp : str
+        Path to a file with one placeholder of missing values per line.
+    jobs : int
+        Number of metadata files to process in parallel
+        (one process per metadata file).
     """
 
     logs = []
-    # Collect the metadata tables as pandas DataFrame
-    metadatas = get_metadata_files(metadata_files)
-    # Get the dtypes of each column for each metadata table
-    dtypes = get_dtypes(metadatas)
-    numerical, categorical = split_variables_types(dtypes)
-    # Get categorical metadata variables to stratify on
-    stratas = get_stratification(metadatas, categorical, stratify,
-                                 max_strata, merge, logs)
-    make_plots(metadatas, stratas, numerical, distributions, number_of_samples, logs)
+    profile = profile or bool(profile_fp)
+    metadata_files = list(dict.fromkeys(metadata_files))
+    schema, placeholders, na_values = get_schema_placeholders(
+        schema, nan_values, nan_values_fp)
+    params = (stratify, number_of_samples, max_strata, merge, aggregate, chunksize,
+              max_rows, cache_dir, seed, approx, profile, schema, na_values)
+    if jobs > 1 and len(metadata_files) > 1:
+        # Each metadata file is processed by a worker that only
+        # returns the data of its figures (in the files order)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(xplor_metadata, metadata_files,
+                                        *[repeat(x) for x in params]))
+    else:
+        results = [xplor_metadata(md_fp, *params) for md_fp in metadata_files]
+
+    figures, stages, dtypes = [], [], {}
+    for md_fp, (md_figures, md_logs, md_profile, md_dtypes) in zip(metadata_files, results):
+        figures.extend(md_figures)
+        logs.extend(md_logs)
+        if md_profile:
+            stages.extend(md_profile)
+        dtypes[md_fp] = md_dtypes
+    # Flag the variables that are not of the same type across files
+    get_dtypes_conflicts(dtypes, logs)
+    if schema_out:
+        write_schema(get_schema(dtypes, placeholders), schema_out)
+    # Only the visualizations which figures changed are written again
+    manifest = read_manifest(cache_dir) if cache_dir else None
+    with profile_stage(stages if profile else None, 'plot_figures') as record:
+        plot_figures(figures, distributions, split, data_format, manifest=manifest)
+        record['rows'] = len(figures)
+    if cache_dir:
+        write_manifest(cache_dir, manifest)
 
     if logs:
         show_log(logs, max_strata)
+
+    if profile:
+        show_profile(stages)
+        if profile_fp:
+            write_profile(stages, profile_fp)
@@ -10,7 +10,138 @@ import pandas as pd
 import numpy as np
 
 
-def get_dtypes_final(md: pd.DataFrame, dtypes_init: dict) -> dict:
+to_nan_vals = {
+    'Unknown', 'unknown', 'Unspecified', 'unspecified',
+    'not provided', 'Not provided', 'Not Provided',
+    'not applicable', 'Not applicable', 'Not Applicable',
+    'Missing', 'missing'
+}
+
+
+def get_placeholders(nan_values: tuple = None, nan_values_fp: str = None,
+                     schema_na_values: list = None) -> list:
+    """
+    Get the placeholders of missing values: those of the schema, those
+    given directly and those in a file (one per line), or the default
+    ones (to_nan_vals) if none of these is given (an empty list of
+    placeholders means that there are none).
+
+    Parameters
+    ----------
+    nan_values : tuple
+        Placeholders of missing values.
+    nan_values_fp : str
+        Path to a file with one placeholder per line.
+    schema_na_values : list
+        Placeholders of missing values of the schema.
+
+    Returns
+    -------
+    placeholders : list
+        Placeholders of missing values.
+    """
+    if nan_values is None and nan_values_fp is None and schema_na_values is None:
+        return sorted(to_nan_vals)
+    placeholders = list(schema_na_values or []) + list(nan_values or [])
+    if nan_values_fp:
+        with open(nan_values_fp) as f:
+            placeholders.extend(x.strip() for x in f if x.strip())
+    placeholders = list(dict.fromkeys(placeholders))
+    return placeholders
+
+
+def get_nan_values(placeholders: list = None) -> list:
+    """
+    Get the placeholders of missing values, which are replaced by
+    np.nan when reading the metadata (default ones if None).
+    The matching is case-insensitive: the usual case variants of
+    each placeholder are returned, for pd.read_csv's exact matching
+    (other variants are caught by the dtypes inference).
+
+    Parameters
+    ----------
+    placeholders : list
+        Placeholders of missing values (see get_placeholders).
+
+    Returns
+    -------
+    na_values : list
+        Placeholders of missing values and their case variants.
+    """
+    if placeholders is None:
+        placeholders = to_nan_vals
+    na_values = set()
+    for x in placeholders:
+        na_values.update([x, x.lower(), x.upper(), x.title(), x.capitalize()])
+    na_values = sorted(na_values)
+    return na_values
+
+
+def is_nan_value(md: pd.DataFrame, na_values: list = None) -> pd.DataFrame:
+    """
+    Find the missing values and their placeholders (in any case).
+
+    Parameters
+    ----------
+    md : pd.DataFrame
+        Metadata table.
+    na_values : list
+        Placeholders of missing values (see get_nan_values).
+
+    Returns
+    -------
+    is_nan : pd.DataFrame
+        Whether each value is missing.
+    """
+    if na_values is None:
+        na_values = get_nan_values()
+    lower_na_values = set(x.lower() for x in na_values)
+    as_str = md.astype(str)
+    is_nan = md.isna() | (as_str == 'nan') | as_str.apply(
+        lambda x: x.str.lower().isin(lower_na_values))
+    return is_nan
+
+
+def get_floats(md: pd.DataFrame) -> tuple:
+    """
+    Parse the values of a metadata table as floats, accepting the
+    same strings as python's float() (pd.to_numeric does not parse
+    e.g. "NaN" or "1_000", which are then passed to float()).
+
+    Parameters
+    ----------
+    md : pd.DataFrame
+        Metadata table.
+
+    Returns
+    -------
+    numeric_md : pd.DataFrame
+        Metadata table values as floats (np.nan if not parsable).
+    is_float : pd.DataFrame
+        Whether each value is parsable as a float.
+    """
+    numeric_md = md.apply(pd.to_numeric, errors='coerce')
+    is_float = numeric_md.notna()
+    to_parse = md.notna() & ~is_float
+    if to_parse.to_numpy().any():
+        floats = {}
+        for val in pd.unique(md.to_numpy()[to_parse.to_numpy()]):
+            try:
+                floats[val] = float(val)
+            except (ValueError, TypeError):
+                continue
+        if floats:
+            is_parsed = md.isin(list(floats)) & to_parse
+            numeric_md = numeric_md.astype('float64')
+            for variable in is_parsed.columns[is_parsed.any()]:
+                rows = is_parsed[variable]
+                numeric_md.loc[rows, variable] = md.loc[rows, variable].map(floats)
+            is_float |= is_parsed
+    return numeric_md, is_float
+
+
+def get_dtypes_final(md: pd.DataFrame, dtypes_init: dict,
+                     na_values: list = None) -> dict:
     """
     Refine the inference of the current variables' dtypes
 
@@ -28,6 +159,8 @@ def get_dtypes_final(md: pd.DataFrame, dtypes_init: dict) -> dict:
                 ['object', 'object'] : factors are strings
                 ['object', 'float']  : factors are float (or np.nan)
                 ['object', 'check']  : factors are float + "polluting" string
+    na_values : list
+        Placeholders of missing values (see get_nan_values).
 
     Returns
     -------
@@ -35,32 +168,25 @@ def get_dtypes_final(md: pd.DataFrame, dtypes_init: dict) -> dict:
         Key     = variable
         Value   = dtype
     """
-    to_nan_vals = {
-        'Unknown', 'unknown', 'Unspecified', 'unspecified',
-        'not provided', 'Not provided', 'Not Provided',
-        'not applicable', 'Not applicable', 'Not Applicable',
-        'Missing', 'missing'
-    }
-    to_nan = dict((x, np.nan) for x in to_nan_vals)
     # true_false_rep = {True: 'Yes', False: 'No'}
     # md.replace(dict((x, true_false_rep) for x in md.columns), inplace=True)
-    dtypes_final = {}
-    for variable, dtypes in dtypes_init.items():
-        if dtypes[-1] == 'check':
-            factors = md[variable].replace(to_nan)
-            for val in factors.unique().tolist():
-                if str(val) != 'nan':
-                    try:
-                        float(val)
-                    except ValueError:
-                        dtypes_final[variable] = 'object'
-                        break
-            else:
+    dtypes_final = dict((variable, dtypes[-1]) for variable, dtypes in dtypes_init.items())
+    to_check = [variable for variable, dtype in dtypes_final.items() if dtype == 'check']
+    if to_check:
+        # all the "check" variables are resolved at once
+        check_md = md[to_check]
+        is_nan = is_nan_value(check_md, na_values)
+        numeric_md, is_float = get_floats(check_md)
+        is_float = (is_float | is_nan).all()
+        for variable in to_check:
+            if is_float[variable]:
                 dtypes_final[variable] = 'float'
-                md.replace({variable: to_nan}, inplace=True)
-                md[variable] = md[variable].astype('float64')
-        else:
-            dtypes_final[variable] = dtypes[-1]
+            else:
+                dtypes_final[variable] = 'object'
+        floats = is_float.index[is_float].tolist()
+        if floats:
+            # the "nan" placeholders are coerced to np.nan
+            md[floats] = numeric_md[floats].astype('float64')
     return dtypes_final
 
 
@@ -87,6 +213,7 @@ def get_dtypes_init(md: pd.DataFrame) -> dict:
                 ['object', 'check']  : factors are float + "polluting" string
     """
     dtypes_init = {}
+    objects = []
     for variable in md.columns[1:]:
         # for the current metadata table's column
         native_type = str(md[variable].dtypes)   # get the current, pandas dtype
@@ -95,7 +222,54 @@ def get_dtypes_init(md: pd.DataFrame) -> dict:
         elif native_type.startswith('float'):
             dtypes_init[variable] = ['float']
         else:
-            dtypes_init[variable] = check_dtype_object(md[variable])
+            dtypes_init[variable] = None
+            objects.append(variable)
+    if objects:
+        # all the non-numeric variables are checked at once
+        dtypes_init.update(get_dtypes_objects(md[objects]))
+    return dtypes_init
+
+
+def get_dtypes_objects(objects_md: pd.DataFrame) -> dict:
+    """
+    Check the factors of all the non-numeric variables at once.
+
+    Parameters
+    ----------
+    objects_md : pd.DataFrame
+        Non-numeric variables of the current metadata table.
+
+    Returns
+    -------
+    dtypes_init : dict
+        Key     = variable
+        Value   = two-items list for the dtype status of the
+                  metadata variable (see check_dtype_object).
+    """
+    as_str = objects_md.astype(str)
+    is_nan = objects_md.isna() | (as_str == 'nan')
+    is_tf = as_str.isin(['True', 'Falsw']) & ~is_nan
+    is_float = get_floats(objects_md)[1] & ~(is_nan | is_tf)
+    is_non_float = ~(is_nan | is_tf | is_float)
+
+    has_nan = is_nan.any()
+    has_tf = is_tf.any()
+    has_float = is_float.any()
+    has_non_float = is_non_float.any()
+
+    dtypes_init = {}
+    for variable in objects_md.columns:
+        # if factors contain at least one non-float
+        if has_non_float[variable]:
+            if has_float[variable] or has_nan[variable]:
+                dtypes_init[variable] = ['object', 'check']
+            else:
+                dtypes_init[variable] = ['object', 'object']
+        else:
+            if has_tf[variable]:
+                dtypes_init[variable] = ['object', 'object']
+            else:
+                dtypes_init[variable] = ['object', 'float']
     return dtypes_init
 
 
@@ -117,39 +291,12 @@ def check_dtype_object(factors: pd.Series) -> list:
             ['object', 'float']  : factors are float (or np.nan)
             ['object', 'check']  : factors are float + "polluting" string
             """
-    d_type = ['object']
-    has_nan = False
-    has_float = False
-    has_non_float = False
-    has_tf = False
-    # for the unique factors of the current variable
-    for val in factors.unique().tolist():
-        if str(val) == 'nan':
-            has_nan = True # if np.nan in the factors
-        elif str(val) in ['True', 'Falsw']:
-            has_tf = True  # if np.nan in the factors
-        else:
-            # check if the non-np.nan values are float
-            try:
-                float(val)
-                has_float = True
-            except ValueError:
-                has_non_float = True
-    # if factors contain at least one non-float
-    if has_non_float:
-        if has_float or has_nan:
-            d_type.append('check')
-        else:
-            d_type.append('object')
-    else:
-        if has_tf:
-            d_type.append('object')
-        else:
-            d_type.append('float')
+    factors = pd.Series(factors.unique(), dtype=object)
+    d_type = get_dtypes_objects(factors.to_frame())[0]
     return d_type
 
 
-def get_dtypes(metadatas: dict) -> dict:
+def get_dtypes(metadatas: dict, na_values: list = None) -> dict:
     """
     Get the dtypes of each column for each metadata table.
 
@@ -159,6 +306,8 @@ def get_dtypes(metadatas: dict) -> dict:
         pandas DataFrames for metadata
         Key     = Metadata file path.
         Value   = Metadata table.
+    na_values : list
+        Placeholders of missing values (see get_nan_values).
 
     Returns
     -------
@@ -169,10 +318,63 @@ def get_dtypes(metadatas: dict) -> dict:
     dtypes = {}
     for md_fp, md in metadatas.items():
         dtypes_init = get_dtypes_init(md)
-        dtypes[md_fp] = get_dtypes_final(md, dtypes_init)
+        dtypes[md_fp] = get_dtypes_final(md, dtypes_init, na_values)
     return dtypes
 
 
+def get_dtypes_scan(scan: dict, na_values: list = None) -> dict:
+    """
+    Get the dtypes of each column of a metadata table from the
+    statistics accumulated while streaming it, following the
+    same rules as for a metadata table read in memory.
+
+    Parameters
+    ----------
+    scan : dict
+        Key     = variable (in the metadata columns order)
+        Value   = dict with the numbers of values, of
+                  missing values, of numeric values, whether all
+                  the numeric values are integers and the set of
+                  distinct non-numeric values.
+    na_values : list
+        Placeholders of missing values (see get_nan_values).
+
+    Returns
+    -------
+    dtypes_final : dict
+        Key     = variable
+        Value   = dtype
+    """
+    if na_values is None:
+        na_values = get_nan_values()
+    lower_na_values = set(x.lower() for x in na_values)
+    # NaN only columns are removed before the inference
+    variables = [x for x, stats in scan.items() if stats['nan'] < stats['n']]
+    dtypes_final = {}
+    for variable in variables[1:]:
+        stats = scan[variable]
+        non_numeric = stats['non_numeric']
+        if not non_numeric:
+            if stats['int'] and not stats['nan']:
+                dtypes_final[variable] = 'int'
+            else:
+                dtypes_final[variable] = 'float'
+            continue
+        # the distinct values are representative of the variable's factors
+        factors = pd.Series(sorted(non_numeric) +
+                            [0.] * bool(stats['numeric']) +
+                            [np.nan] * bool(stats['nan']), dtype=object)
+        dtypes = check_dtype_object(factors)
+        if dtypes[-1] == 'check':
+            if set(x.lower() for x in non_numeric).issubset(lower_na_values):
+                dtypes_final[variable] = 'float'
+            else:
+                dtypes_final[variable] = 'object'
+        else:
+            dtypes_final[variable] = dtypes[-1]
+    return dtypes_final
+
+
 def split_variables_types(dtypes: dict) -> tuple:
     """
     Split variables od each metadata according to
@@ -201,4 +403,55 @@ def split_variables_types(dtypes: dict) -> tuple:
                 categorical.setdefault(md_fp, []).append(var)
             elif dtype in ['int', 'float']:
                 numerical.setdefault(md_fp, []).append(var)
-        return numerical, categorical
+    return numerical, categorical
+
+
+def get_dtypes_index(dtypes: dict) -> pd.DataFrame:
+    """
+    Get the dtype of each variable in each metadata table, and
+    whether the variable is numeric in some tables but categorical
+    (or else) in others, e.g. because of a single non-numeric value.
+
+    Parameters
+    ----------
+    dtypes : dict
+        Key     = Metadata file path.
+        Value   = Metadata variables' dtypes
+
+    Returns
+    -------
+    index : pd.DataFrame
+        Variables (rows) dtype in each metadata table (columns,
+        NaN if not in the table) and whether it is a "conflict".
+    """
+    index = pd.DataFrame(dtypes, columns=list(dtypes))
+    kinds = index.replace({'int': 'numeric', 'float': 'numeric'})
+    index['conflict'] = kinds.nunique(axis=1) > 1
+    return index
+
+
+def get_dtypes_conflicts(dtypes: dict, logs: list) -> pd.DataFrame:
+    """
+    Log the variables that do not have the same type in all
+    the metadata tables in which they are present.
+
+    Parameters
+    ----------
+    dtypes : dict
+        Key     = Metadata file path.
+        Value   = Metadata variables' dtypes
+    logs : list
+        List of lists: each nested list is:
+            [variable, metadata file path, warning message, a number]
+
+    Returns
+    -------
+    index : pd.DataFrame
+        Variables (rows) dtype in each metadata table (columns)
+        and whether it is a "conflict" (see get_dtypes_index).
+    """
+    index = get_dtypes_index(dtypes)
+    for variable, variable_dtypes in index.loc[index['conflict'], list(dtypes)].iterrows():
+        for md_fp, dtype in variable_dtypes.dropna().items():
+            logs.append([variable, md_fp, 'dtype conflict', dtype])
+    return index
@@ -41,6 +41,15 @@ def show_log(logs: list, max_strata: int) -> None:
                 for var in md_pd.variable.unique():
                     print(' -', var)
 
+            elif warning == 'dtype conflict':
+                for var, dtype in md_pd[['variable', 'number']].values:
+                    if dtype in ['int', 'float']:
+                        print(' - %s is %s here but not numeric in other '
+                              'metadata file(s)' % (var, dtype))
+                    else:
+                        print(' - %s is numeric in other metadata file(s) '
+                              'but %s here' % (var, dtype))
+
             elif warning == 'not enough samples':
                 for var, num in md_pd[['variable', 'number']].values:
                     print(' - %s samples for factor %s' % (var, num))
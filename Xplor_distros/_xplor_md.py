@@ -6,12 +6,16 @@
 # The full license is in the file LICENSE, distributed with this software.
 # ----------------------------------------------------------------------------
 
+import numpy as np
 import pandas as pd
 
+from Xplor_distros._xplor_dtypes import get_dtypes_scan, get_floats, get_nan_values
+from Xplor_distros._xplor_sampling import reservoir_sample
 
-def read_meta_pd(meta: str) -> pd.DataFrame:
+
+def get_first_column(meta: str) -> str:
     """
-    Read metadata with first column as index.
+    Get the name of the first column of a metadata file.
 
     Parameters
     ----------
@@ -20,14 +24,61 @@ def read_meta_pd(meta: str) -> pd.DataFrame:
 
     Returns
     -------
-    meta_pd : pd.DataFrame
-        Metadata table.
+    first_col : str
+        Name of the samples' column.
     """
     with open(meta) as f:
         for line in f:
             first_col = line.split()[0]
             break
-    meta_pd = pd.read_csv(meta, header=0, sep='\t', dtype={first_col: str}, low_memory=False)
+    return first_col
+
+
+def get_na_values(meta: str, na_values: list = None) -> dict:
+    """
+    Get the placeholders of missing values for each variable (i.e.
+    not for the samples names) to pass to pd.read_csv.
+
+    Parameters
+    ----------
+    meta : str
+        Metadata file path.
+    na_values : list
+        Placeholders of missing values (default placeholders if None).
+
+    Returns
+    -------
+    na_values : dict
+        Key     = variable
+        Value   = Placeholders of missing values.
+    """
+    if na_values is None:
+        na_values = get_nan_values()
+    variables = pd.read_csv(meta, header=0, sep='\t', nrows=0).columns[1:]
+    na_values = dict((x, na_values) for x in variables)
+    return na_values
+
+
+def read_meta_pd(meta: str, na_values: list = None) -> pd.DataFrame:
+    """
+    Read metadata with first column as index.
+
+    Parameters
+    ----------
+    meta : str
+        Metadata file path.
+    na_values : list
+        Placeholders of missing values (see get_nan_values),
+        parsed as np.nan so that numeric variables are read as such.
+
+    Returns
+    -------
+    meta_pd : pd.DataFrame
+        Metadata table.
+    """
+    first_col = get_first_column(meta)
+    meta_pd = pd.read_csv(meta, header=0, sep='\t', dtype={first_col: str}, low_memory=False,
+                          na_values=get_na_values(meta, na_values))
     meta_pd.rename(columns={first_col: 'sample_name'}, inplace=True)
     meta_pd.set_index('sample_name', inplace=True)
 
@@ -37,7 +88,61 @@ def read_meta_pd(meta: str) -> pd.DataFrame:
     return meta_pd
 
 
-def get_metadata_files(metadata_files: tuple) -> dict:
+def read_meta_schema(meta: str, schema: dict, chunksize: int = None,
+                     max_rows: int = None, seed: int = None) -> tuple:
+    """
+    Read metadata with first column as index, with the types of
+    the variables given by a schema instead of inferred (the
+    variables that are not in the schema are not read).
+
+    Parameters
+    ----------
+    meta : str
+        Metadata file path.
+    schema : dict
+        "variables": type of each variable,
+        "na_values": missing values placeholders.
+    chunksize : int
+        Number of rows per chunk to stream the metadata file.
+    max_rows : int
+        Maximum number of randomly selected rows to keep
+        when streaming by chunks.
+    seed : int
+        Seed for the random rows selection.
+
+    Returns
+    -------
+    meta_pd : pd.DataFrame
+        Metadata table.
+    dtypes : dict
+        Key     = variable
+        Value   = dtype
+    """
+    schema_types = {'numeric': float, 'categorical': str}
+    first_col = get_first_column(meta)
+    header = pd.read_csv(meta, header=0, sep='\t', nrows=0).columns.tolist()
+    variables = [x for x in header[1:] if schema['variables'].get(x) in schema_types]
+    dtype = dict((x, schema_types[schema['variables'][x]]) for x in variables)
+    dtype[first_col] = str
+    try:
+        na_values = get_na_values(meta, get_nan_values(schema['na_values']))
+        meta_pd = pd.read_csv(meta, header=0, sep='\t', usecols=[first_col] + variables,
+                              dtype=dtype, na_values=na_values, chunksize=chunksize)
+        if chunksize:
+            meta_pd = reservoir_sample(meta_pd, max_rows, np.random.default_rng(seed))
+    except ValueError as e:
+        raise ValueError('Non-numeric value for a "numeric" variable of the schema in %s '
+                         '(add it to the schema\'s NaN placeholders?): %s' % (meta, e))
+    meta_pd.rename(columns={first_col: 'sample_name'}, inplace=True)
+    meta_pd.set_index('sample_name', inplace=True)
+
+    # remove NaN only columns
+    meta_pd = meta_pd.loc[:, ~meta_pd.isna().all()]
+    dtypes = dict((x, 'float' if dtype[x] is float else 'object') for x in meta_pd.columns)
+    return meta_pd, dtypes
+
+
+def get_metadata_files(metadata_files: tuple, na_values: list = None) -> dict:
     """
     Collect the metadata tables as pandas DataFrame.
 
@@ -45,6 +150,8 @@ def get_metadata_files(metadata_files: tuple) -> dict:
     ----------
     metadata_files : tuple
         Paths to the metadata file for which to make visualizations.
+    na_values : list
+        Placeholders of missing values (see get_nan_values).
 
     Returns
     -------
@@ -54,7 +161,193 @@ def get_metadata_files(metadata_files: tuple) -> dict:
     """
     metadatas = {}
     for meta in metadata_files:
-        meta_pd = read_meta_pd(meta)
+        meta_pd = read_meta_pd(meta, na_values)
         metadatas[meta] = meta_pd
 
     return metadatas
+
+
+def read_meta_chunks(meta: str, chunksize: int, usecols: list = None,
+                     na_values: list = None):
+    """
+    Stream the metadata by chunks of rows, with the
+    first column as index and all values read as strings.
+
+    Parameters
+    ----------
+    meta : str
+        Metadata file path.
+    chunksize : int
+        Number of rows per chunk.
+    usecols : list
+        Variables to read (all if None).
+    na_values : list
+        Placeholders of missing values (see get_nan_values).
+
+    Yields
+    ------
+    chunk : pd.DataFrame
+        Metadata table chunk.
+    """
+    first_col = get_first_column(meta)
+    if usecols is not None:
+        usecols = [first_col] + [x for x in usecols if x != first_col]
+    for chunk in pd.read_csv(meta, header=0, sep='\t', dtype=str, usecols=usecols,
+                             na_values=get_na_values(meta, na_values),
+                             chunksize=chunksize):
+        chunk.rename(columns={first_col: 'sample_name'}, inplace=True)
+        chunk.set_index('sample_name', inplace=True)
+        yield chunk
+
+
+def scan_meta_pd(meta: str, chunksize: int, max_non_numeric: int = 1000,
+                 na_values: list = None) -> dict:
+    """
+    Accumulate chunk by chunk the statistics on the
+    values of each column that are needed to infer
+    its dtype, without keeping the values in memory.
+
+    Parameters
+    ----------
+    meta : str
+        Metadata file path.
+    chunksize : int
+        Number of rows per chunk.
+    max_non_numeric : int
+        Maximum number of distinct non-numeric values to collect
+        per variable (beyond, the variable can only be categorical).
+    na_values : list
+        Placeholders of missing values (see get_nan_values).
+
+    Returns
+    -------
+    scan : dict
+        Key     = variable (in the metadata columns order)
+        Value   = dict with the numbers of values, of
+                  missing values, of numeric values, whether all
+                  the numeric values are integers and the set of
+                  distinct non-numeric values.
+    """
+    scan = {}
+    for chunk in read_meta_chunks(meta, chunksize, na_values=na_values):
+        is_nan = chunk.isna()
+        is_numeric = chunk.apply(pd.to_numeric, errors='coerce').notna()
+        is_int = chunk.apply(lambda x: x.str.fullmatch(r'\s*[+-]?\d+\s*'))
+        is_non_numeric = ~(is_nan | is_numeric)
+        n_nan = is_nan.sum()
+        n_numeric = is_numeric.sum()
+        all_int = (is_int.fillna(True).astype(bool) | ~is_numeric).all()
+        for variable in chunk.columns:
+            stats = scan.setdefault(variable, {
+                'n': 0, 'nan': 0, 'numeric': 0,
+                'int': True, 'non_numeric': set()})
+            stats['n'] += chunk.shape[0]
+            stats['nan'] += int(n_nan[variable])
+            stats['numeric'] += int(n_numeric[variable])
+            stats['int'] &= bool(all_int[variable])
+            if len(stats['non_numeric']) < max_non_numeric:
+                non_numeric = chunk.loc[is_non_numeric[variable], variable]
+                stats['non_numeric'].update(non_numeric.unique().tolist())
+    return scan
+
+
+def read_meta_projected(meta: str, chunksize: int, numerical: list,
+                        usecols: list, max_rows: int = None,
+                        seed: int = None, na_values: list = None) -> pd.DataFrame:
+    """
+    Read chunk by chunk only the variables that are needed,
+    parsing the numeric ones as such and keeping at most a
+    uniform random sample of rows (see reservoir_sample).
+
+    Parameters
+    ----------
+    meta : str
+        Metadata file path.
+    chunksize : int
+        Number of rows per chunk.
+    numerical : list
+        Metadata variables that are numeric.
+    usecols : list
+        Metadata variables to read.
+    max_rows : int
+        Maximum number of rows to keep (all if None).
+    seed : int
+        Seed for the random rows selection.
+    na_values : list
+        Placeholders of missing values (see get_nan_values).
+
+    Returns
+    -------
+    meta_pd : pd.DataFrame
+        Metadata table.
+    """
+    chunks = read_meta_chunks(meta, chunksize, usecols, na_values)
+    meta_pd = reservoir_sample(parse_numerical(chunks, numerical), max_rows,
+                               np.random.default_rng(seed))
+    return meta_pd
+
+
+def parse_numerical(chunks, numerical: list):
+    """
+    Parse the numeric variables of metadata chunks.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Metadata table chunks.
+    numerical : list
+        Metadata variables that are numeric.
+
+    Yields
+    ------
+    chunk : pd.DataFrame
+        Metadata table chunk.
+    """
+    for chunk in chunks:
+        if numerical:
+            chunk[numerical] = get_floats(chunk[numerical])[0]
+        yield chunk
+
+
+def get_metadata_chunks(metadata_files: tuple, stratify: tuple,
+                        chunksize: int, max_rows: int = None,
+                        seed: int = None, na_values: list = None) -> tuple:
+    """
+    Collect the metadata tables as pandas DataFrame by streaming
+    each file twice: once to infer the dtypes and once to only
+    read the numeric and stratification variables.
+
+    Parameters
+    ----------
+    metadata_files : tuple
+        Paths to the metadata file for which to make visualizations.
+    stratify : tuple
+        Metadata variables on which to split the visualizations.
+    chunksize : int
+        Number of rows per chunk.
+    max_rows : int
+        Maximum number of rows to keep per metadata file.
+    seed : int
+        Seed for the random rows selection.
+    na_values : list
+        Placeholders of missing values (see get_nan_values).
+
+    Returns
+    -------
+    metadatas : dict
+        Key     = File path to a metadata file.
+        Value   = Metadata table.
+    dtypes : dict
+        Key     = Metadata file path.
+        Value   = Metadata variables' dtypes
+    """
+    metadatas = {}
+    dtypes = {}
+    for meta in metadata_files:
+        scan = scan_meta_pd(meta, chunksize, na_values=na_values)
+        dtypes[meta] = get_dtypes_scan(scan, na_values)
+        numerical = [x for x, y in dtypes[meta].items() if y in ['int', 'float']]
+        usecols = [x for x in scan if x in numerical or x in stratify]
+        metadatas[meta] = read_meta_projected(meta, chunksize, numerical,
+                                              usecols, max_rows, seed, na_values)
+    return metadatas, dtypes
@@ -7,17 +7,73 @@
 # ----------------------------------------------------------------------------
 
 import os
-import random
+import hashlib
+from functools import lru_cache
 import pandas as pd
 import numpy as np
-from scipy.stats import skew
-from os.path import isdir, dirname
+from html import escape
+from os.path import abspath, isdir, isfile, dirname, basename, splitext
 
-from matplotlib.colors import rgb2hex
-from matplotlib.pyplot import cm
+from Xplor_distros._xplor_stats import get_stats
+from Xplor_distros._xplor_sampling import subset_samples
+from Xplor_distros._xplor_profile import profile_stage
 
 import altair
-altair.data_transformers.disable_max_rows()
+
+INDEX_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Xplor_distros</title>
+<style>
+body { font-family: sans-serif; }
+summary { cursor: pointer; padding: 4px; }
+iframe { border: none; width: 100%%; }
+</style>
+</head>
+<body>
+%s
+<script>
+document.querySelectorAll('details[data-src]').forEach(function (section) {
+  section.addEventListener('toggle', function () {
+    if (section.open && !section.querySelector('iframe')) {
+      var frame = document.createElement('iframe');
+      frame.src = section.dataset.src;
+      frame.style.height = (480 * section.dataset.rows + 40) + 'px';
+      section.appendChild(frame);
+    }
+  });
+});
+</script>
+</body>
+</html>
+"""
+
+
+@lru_cache(maxsize=None)
+def get_palette(n_colors: int) -> tuple:
+    """
+    Get evenly spaced colors of the "rainbow" color map (same
+    formulas and 256-colors lookup table as in matplotlib).
+
+    Parameters
+    ----------
+    n_colors : int
+        Number of colors.
+
+    Returns
+    -------
+    palette : tuple
+        Hexadecimal colors, from purple to red.
+    """
+    lut_x = np.linspace(0, 1, 256)
+    lut = np.clip(np.column_stack([np.abs(2 * lut_x - 0.5),
+                                   np.sin(np.pi * lut_x),
+                                   np.cos(np.pi / 2 * lut_x)]), 0, 1)
+    idx = np.minimum((np.linspace(0, 1, n_colors) * 256).astype(int), 255)
+    rgb = np.round(lut[idx] * 255).astype(int)
+    palette = tuple('#%02x%02x%02x' % tuple(x) for x in rgb)
+    return palette
 
 
 def get_colors(feats: list) -> list:
@@ -33,15 +89,34 @@ def get_colors(feats: list) -> list:
     Returns
     -------
     colors : list
-        One color per feature
+        One color per unique feature, in the sorted features order
     """
-    colors = list(set([rgb2hex(x) for x in cm.rainbow(np.linspace(0, 1, len(feats)))]))
+    colors = list(get_palette(len(set(feats))))
     return colors
 
 
-def get_unstacked_md(numerical_factor_md: pd.DataFrame) -> pd.DataFrame:
+def get_domain(figures: list) -> list:
     """
-    Subset the metadata table to its numeric columns.
+    Get the numeric variables of all the rows of figures, for
+    their colors to be the same across all the rows.
+
+    Parameters
+    ----------
+    figures : list
+        One (title, figure table, binned table) tuple per row of figures.
+
+    Returns
+    -------
+    domain : list
+        Sorted numeric variables.
+    """
+    domain = sorted(set().union(*[x[1]['variable'].unique() for x in figures]))
+    return domain
+
+
+def get_summary_md(numerical_factor_md: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute the median and skewness of each numeric variable.
 
     Parameters
     ----------
@@ -50,123 +125,558 @@ def get_unstacked_md(numerical_factor_md: pd.DataFrame) -> pd.DataFrame:
 
     Returns
     -------
-    unstacked_md : pd.DataFrame
-        Merge of the current factors' numerical dataframe
-        with the median and skewness computed for these variable.
+    summary_md : pd.DataFrame
+        One row per variable with its median and skewness.
     """
+    # only imported without pre-computed statistics (slow to import)
+    from scipy.stats import skew
     variables = list(numerical_factor_md.columns.tolist())
     medians = list(np.nanmedian(numerical_factor_md, axis=0))
     skewness = list(skew(numerical_factor_md.values, axis=0, nan_policy='omit'))
-    to_merge = pd.DataFrame({'variable': variables,
-                             'median': medians,
-                             'skewness': skewness})
-
-    unstacked_md = numerical_factor_md.unstack().reset_index().rename(
-        columns={'level_0': 'variable', 0: 'value'}).copy()
-
-    unstacked_md = unstacked_md.merge(to_merge, on='variable', how='left')
-    return unstacked_md
+    summary_md = pd.DataFrame({'variable': variables,
+                               'median': medians,
+                               'skewness': skewness})
+    return summary_md
 
 
-def make_plots(metadatas: dict, stratas: dict, numerical: dict,
-               distributions: str, number_of_samples: int, logs: list) -> None:
+def get_median_log10(medians: pd.Series) -> np.ndarray:
     """
-    Make the rows of interactive figures (three panels)
-    for each metadata table and for each stratification.
-    Write the output as interactive html file.
+    Get the log10 of the strictly positive medians,
+    leaving the other medians unchanged.
 
     Parameters
     ----------
-    metadatas : dict
-        Key     = File path to a metadata file.
-        Value   = Metadata table.
-    stratas : dict
-        Key     = Metadata file path.
-        Value   = List of variables to stratify on.
-    numerical : dict
-        Key     = Metadata file path.
-        Value   = Metadata variables that are numeric.
-    distributions : str
-        Output visualization file path.
-    number_of_samples : int
-        Number of samples to randomly select to compute the distributions.
-    logs : list
-        List of lists: each nested list is:
-            [variable, metadata file path, warning message, a number]
+    medians : pd.Series
+        Median of each numeric variable.
+
+    Returns
+    -------
+    medians_log10 : np.ndarray
+        Log10-transformed medians.
     """
+    medians_log10 = medians.to_numpy(dtype=float, copy=True)
+    positive = medians_log10 > 0
+    medians_log10[positive] = np.log10(medians_log10[positive])
+    return medians_log10
 
-    if stratas:
-        chart = None
-        first_chart = True
-        for md_fp, md in metadatas.items():
-            for strata in stratas[md_fp]:
-                for factor, factor_md in md.groupby(strata):
 
-                    numerical_md = factor_md[numerical[md_fp]].copy()
-                    unstacked_md = get_unstacked_md(numerical_md)
+def get_binned_md(numerical_factor_md: pd.DataFrame,
+                  summary_md: pd.DataFrame,
+                  maxbins: int = 50) -> pd.DataFrame:
+    """
+    Pre-compute the histogram of each numeric variable on its own
+    bin edges (maxbins bins between the variable's minimum and
+    maximum), in a single vectorized pass over the numerical
+    values of the current factor.
 
-                    title = '\n'.join([md_fp, strata, factor])
-                    figure_tab = subset_samples(md_fp, factor, unstacked_md,
-                                                number_of_samples, logs)
+    Parameters
+    ----------
+    numerical_factor_md : pd.DataFrame
+        Metadata table subset to the current stratification factors.
+    summary_md : pd.DataFrame
+        One row per variable with its median and skewness.
+    maxbins : int
+        Number of bins for the histogram of each variable.
 
-                    strati_chart = plot_altair(title, figure_tab)
-                    if first_chart:
-                        chart = strati_chart
-                        first_chart = False
-                    else:
-                        chart = (chart & strati_chart)
+    Returns
+    -------
+    binned_md : pd.DataFrame
+        One row per non-empty bin per variable, with the bin edges,
+        the number of values in the bin and the variable's summary
+        (so that the bins can be filtered on the summary points).
+    """
+    columns = ['variable', 'bin_start', 'bin_end', 'count']
+    values = numerical_factor_md.to_numpy(dtype=float)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return pd.DataFrame(columns=columns).merge(summary_md, on='variable')
+
+    # per variable range (as np.histogram_bin_edges for constant values)
+    lows = np.where(finite, values, np.inf).min(axis=0)
+    highs = np.where(finite, values, -np.inf).max(axis=0)
+    constant = lows == highs
+    lows[constant] -= 0.5
+    highs[constant] += 0.5
+    edges = lows[:, None] + (highs - lows)[:, None] * np.linspace(0, 1, maxbins + 1)
+    n_variables = values.shape[1]
+    variables_idx = np.nonzero(finite)[1]
+    positions = (values[finite] - lows[variables_idx]) / (highs - lows)[variables_idx]
+    bins = np.clip((positions * maxbins).astype(int), 0, maxbins - 1)
+    counts = np.bincount(variables_idx * maxbins + bins,
+                         minlength=n_variables * maxbins)
+    variables_idx, bins = np.divmod(np.flatnonzero(counts), maxbins)
+
+    binned_md = pd.DataFrame({
+        columns[0]: numerical_factor_md.columns.to_numpy()[variables_idx],
+        columns[1]: edges[variables_idx, bins],
+        columns[2]: edges[variables_idx, bins + 1],
+        columns[3]: counts[counts > 0]
+    })
+    binned_md = binned_md.merge(summary_md, on='variable', how='left')
+    return binned_md
+
+
+def get_unstacked_md(numerical_factor_md: pd.DataFrame,
+                     summary_md: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Subset the metadata table to its numeric columns.
 
-        # write plot output
-        out_dir = dirname(distributions)
-        if out_dir and not isdir(out_dir):
-            os.makedirs(out_dir)
-        if not distributions.endswith('.html'):
-            distributions = '%s.html' % distributions
-        chart.save(distributions)
+    Parameters
+    ----------
+    numerical_factor_md : pd.DataFrame
+        Metadata table subset to the current stratification factors.
+    summary_md : pd.DataFrame
+        One row per variable with its median and skewness
+        (computed from numerical_factor_md if None).
+
+    Returns
+    -------
+    unstacked_md : pd.DataFrame
+        Merge of the current factors' numerical dataframe
+        with the median and skewness computed for these variable.
+    """
+    if summary_md is None:
+        summary_md = get_summary_md(numerical_factor_md)
+    variables = numerical_factor_md.columns
+    summary = summary_md.set_index('variable').reindex(variables)
+
+    # one row per sample per variable, variable by variable, where
+    # the variables are encoded as categories of the variables names
+    n_samples, n_variables = numerical_factor_md.shape
+    codes = np.repeat(np.arange(n_variables), n_samples)
+    unstacked_md = pd.DataFrame({
+        'variable': pd.Categorical.from_codes(codes, variables),
+        'sample_name': np.tile(numerical_factor_md.index.to_numpy(), n_variables),
+        'value': numerical_factor_md.to_numpy(dtype=float).T.ravel(),
+        'median': summary['median'].to_numpy(dtype=float)[codes],
+        'skewness': summary['skewness'].to_numpy(dtype=float)[codes]
+    })
+    return unstacked_md
 
 
-def subset_samples(md_fp: str, factor: str, unstacked_md: pd.DataFrame,
-                   number_of_samples: int, logs:list) -> pd.DataFrame:
+def get_figure(md_fp: str, title: str, factor: str,
+               numerical_md: pd.DataFrame, summary_md: pd.DataFrame,
+               number_of_samples: int, aggregate: bool = False,
+               rng: np.random.Generator = None) -> tuple:
     """
-    Subset the metadata to a maximum set of 100 samples.
-    ! ATTENTION ! In case there are many columns with np.nan,
-                  these should be selected to select samples
-                  that do have actual numerical values...
+    Get the data of the row of interactive figures
+    for one factor of a stratification.
 
     Parameters
     ----------
     md_fp : str
         Metadata file path.
+    title : str
+        Title for the row plots.
     factor : str
         Stratification factor.
-    unstacked_md : pd.DataFrame
-        Metadata table subset for the current
-        stratification and numerical variables.
+    numerical_md : pd.DataFrame
+        Numeric variables of the metadata table subset to the factor.
+    summary_md : pd.DataFrame
+        Statistics of the numeric variables for the factor.
+    number_of_samples : int
+        Number of samples to randomly select to compute the distributions.
+    aggregate : bool
+        Whether to pre-compute the histograms.
+    rng : np.random.Generator
+        Random numbers generator for the samples selection.
+
+    Returns
+    -------
+    figure : tuple
+        (title, figure table, binned table) for the row of figures.
+    logs : list
+        List of lists: each nested list is:
+            [variable, metadata file path, warning message, a number]
+    """
+    logs = []
+    if aggregate:
+        binned_md = get_binned_md(numerical_md, summary_md)
+        figure = (title, summary_md, binned_md)
+    else:
+        # only the selected samples are unstacked
+        sampled_md = subset_samples(md_fp, factor, numerical_md,
+                                    number_of_samples, logs, rng)
+        figure_tab = get_unstacked_md(sampled_md, summary_md)
+        figure = (title, figure_tab, None)
+    return figure, logs
+
+
+def get_figures(md_fp: str, md: pd.DataFrame, stratas: list,
+                numerical: list, number_of_samples: int, logs: list,
+                aggregate: bool = False, seed: int = None,
+                stats: pd.DataFrame = None,
+                profile: list = None) -> list:
+    """
+    Get the data of the rows of interactive figures
+    for each stratification of one metadata table.
+
+    Parameters
+    ----------
+    md_fp : str
+        Metadata file path.
+    md : pd.DataFrame
+        Metadata table.
+    stratas : list
+        Variables to stratify on.
+    numerical : list
+        Metadata variables that are numeric.
     number_of_samples : int
-        Number of samples to randomly select to
-        compute the distributions.
+        Number of samples to randomly select to compute the distributions.
     logs : list
         List of lists: each nested list is:
             [variable, metadata file path, warning message, a number]
+    aggregate : bool
+        Whether to pre-compute the histograms and only embed the
+        bins and the per-variable summaries in the visualization
+        (all the samples of each factor are then used).
+    seed : int
+        Seed for the random samples selection.
+    stats : pd.DataFrame
+        Statistics of all the factors of all the stratifications
+        (e.g. streamed by chunks, see _xplor_sketch.get_stats_sketches),
+        or None to compute them exactly from the metadata table.
+    profile : list
+        Where to record the time and memory used per stratification
+        (see _xplor_profile.profile_stage), or None.
 
     Returns
     -------
-    figure_tab : pd.DataFrame
-        re-stacked metadata table
-    """
-    # get the unique samples names
-    samples = set(list(unstacked_md.sample_name.tolist()))
-    # take either 100 or if less, all the samples as data for the figure
-    if len(samples) < number_of_samples:
-        logs.append([factor, md_fp, 'not enough samples', len(samples)])
-        figure_tab = unstacked_md.copy()
+    figures : list
+        One (title, figure table, binned table) tuple per row of
+        figures, where the figure table is either the samples values
+        or, if aggregate, the per-variable summaries (in which case
+        the binned table is not None).
+    """
+    if stats is None:
+        # statistics of all the factors of all the stratifications
+        with profile_stage(profile, 'get_stats', md_fp) as record:
+            stats = get_stats(md, stratas, numerical)
+            record['rows'], record['columns'] = md.shape[0], len(numerical)
+    stats = dict(((strata, factor), factor_stats[['variable', 'median', 'skewness']])
+                 for (strata, factor), factor_stats in stats.groupby(['strata', 'factor']))
+    numerical_md = md[numerical]
+    # one random numbers generator per factor for reproducibility
+    seed_sequence = np.random.SeedSequence(seed)
+
+    figures = []
+    for strata in stratas:
+        with profile_stage(profile, 'get_figures', md_fp, strata) as record:
+            factors = numerical_md.groupby(md[strata], observed=True)
+            seeds = seed_sequence.spawn(factors.ngroups)
+            # only the numeric variables are subset per factor
+            for (factor, factor_md), factor_seed in zip(factors, seeds):
+                title = '\n'.join([md_fp, strata, factor])
+                summary_md = stats[(strata, factor)].reset_index(drop=True)
+                figure, figure_logs = get_figure(
+                    md_fp, title, factor, factor_md, summary_md, number_of_samples,
+                    aggregate, np.random.default_rng(factor_seed))
+                figures.append(figure)
+                logs.extend(figure_logs)
+            record['rows'] = int(factors.size().sum())
+            record['columns'] = len(numerical)
+    return figures
+
+
+def get_figures_data(figures: list) -> pd.DataFrame:
+    """
+    Concatenate the tables of all the rows of figures
+    into the one dataset embedded in the visualization.
+
+    Parameters
+    ----------
+    figures : list
+        One (title, figure table, binned table) tuple per row of figures.
+
+    Returns
+    -------
+    figures_data : pd.DataFrame
+        Figures tables, with the row of figures ("figure") of
+        each line and for the pre-computed histograms, the kind
+        of table ("summary" or "bins").
+    """
+    tabs = []
+    for row, (title, figure_tab, binned_md) in enumerate(figures):
+        if binned_md is None:
+            tabs.append(figure_tab.assign(figure=row))
+        else:
+            tabs.append(figure_tab.assign(figure=row, kind='summary'))
+            tabs.append(binned_md.assign(figure=row, kind='bins'))
+    figures_data = pd.concat(tabs, ignore_index=True, sort=False)
+    figures_data['median_log10'] = get_median_log10(figures_data['median'])
+    return figures_data
+
+
+def get_data_file(figure_data: pd.DataFrame, out_dir: str,
+                  data_format: str) -> altair.UrlData:
+    """
+    Write the data of a figure in an external file named after
+    the hash of its content, so that the identical tables of
+    different rows and visualizations are written only once.
+
+    Parameters
+    ----------
+    figure_data : pd.DataFrame
+        Figure table (with the median_log10 column).
+    out_dir : str
+        Folder of the visualization file.
+    data_format : str
+        Format of the data file ("json" or "csv").
+
+    Returns
+    -------
+    data : altair.UrlData
+        Data file location relative to the visualization file.
+    """
+    if data_format == 'csv':
+        content = figure_data.to_csv(index=False)
+        # the CSV fields are strings for Vega unless parsed, which the
+        # fields only used in filters or selections would never be
+        parse = dict((x, 'number') for x in figure_data.columns
+                     if pd.api.types.is_numeric_dtype(figure_data[x]))
+        data_format = altair.DataFormat(type='csv', parse=parse)
     else:
-        random_samples = random.sample(samples, number_of_samples)
-        figure_tab = unstacked_md.loc[unstacked_md.sample_name.isin(random_samples),:].copy()
-    return figure_tab
+        content = figure_data.to_json(orient='records')
+        data_format = altair.DataFormat(type='json')
+    data_fp = 'data-%s.%s' % (hashlib.sha1(content.encode('utf-8')).hexdigest()[:16],
+                              data_format.type)
+    if out_dir and not isdir(out_dir):
+        os.makedirs(out_dir)
+    if not isfile(os.path.join(out_dir, data_fp)):
+        with open(os.path.join(out_dir, data_fp), 'w') as o:
+            o.write(content)
+    data = altair.UrlData(url=data_fp, format=data_format)
+    return data
+
+
+def write_chart(chart, distributions: str) -> str:
+    """
+    Write the chart as interactive html file.
 
+    Parameters
+    ----------
+    chart : altair.vegalite.v3.api.VConcatChart
+        Rows of interactive figures.
+    distributions : str
+        Output visualization file path.
+
+    Returns
+    -------
+    distributions : str
+        Output visualization file path (with .html extension).
+    """
+    out_dir = dirname(distributions)
+    if out_dir and not isdir(out_dir):
+        os.makedirs(out_dir)
+    if not distributions.endswith('.html'):
+        distributions = '%s.html' % distributions
+    if isinstance(chart.data, altair.UrlData) or chart.data is altair.Undefined:
+        chart.save(distributions)
+    else:
+        # the embedded data is not limited to altair's default max rows
+        with altair.data_transformers.disable_max_rows():
+            chart.save(distributions)
+    return distributions
+
+
+def write_index(sections: list, index_fp: str) -> None:
+    """
+    Write the html index page of the visualizations, in which
+    each visualization is only loaded when its section is opened.
+
+    Parameters
+    ----------
+    sections : list
+        One (metadata file path, stratification, number of rows
+        of figures, visualization path relative to the index)
+        tuple per visualization.
+    index_fp : str
+        Output index file path.
+    """
+    body = []
+    current_md_fp = None
+    for md_fp, strata, n_rows, html_fp in sections:
+        if md_fp != current_md_fp:
+            body.append('<h2>%s</h2>' % escape(md_fp))
+            current_md_fp = md_fp
+        body.append('<details data-src="%s" data-rows="%s"><summary>%s (%s)'
+                    '</summary></details>' % (escape(html_fp), n_rows,
+                                              escape(strata), n_rows))
+    with open(index_fp, 'w') as o:
+        o.write(INDEX_HTML % '\n'.join(body))
+
+
+def plot_figures(figures: list, distributions: str, split: bool = False,
+                 data_format: str = None, domain: list = None,
+                 manifest: dict = None) -> None:
+    """
+    Make the rows of interactive figures (three panels)
+    and write the output as interactive html file.
+
+    Parameters
+    ----------
+    figures : list
+        One (title, figure table, binned table) tuple per row of figures.
+    distributions : str
+        Output visualization file path.
+    split : bool
+        Whether to write one visualization per metadata file and
+        stratification, and an index page of these visualizations
+        as output visualization file.
+    data_format : str
+        Format of the external data file(s) written next to the
+        visualization(s) ("json" or "csv"), or None to embed
+        the data in the visualization(s).
+    domain : list
+        Numeric variables of all the rows of figures, which colors
+        are shared by all the rows (see get_domain).
+    manifest : dict
+        Key     = Visualization file path.
+        Value   = Fingerprint of the figures it shows and names
+                  of the data files it reads.
+        The visualizations which figures are unchanged since the
+        previous run and which files are all still present are
+        not written again (updated in place).
+    """
+    if not figures:
+        return
+    if domain is None:
+        domain = get_domain(figures)
+    if not distributions.endswith('.html'):
+        distributions = '%s.html' % distributions
+
+    if split:
+        figures_dir = '%s_figures' % splitext(distributions)[0]
+        # the rows of each metadata file and stratification
+        groups = {}
+        for figure in figures:
+            md_fp, strata = figure[0].split('\n')[:2]
+            groups.setdefault((md_fp, strata), []).append(figure)
+        sections = []
+        for idx, ((md_fp, strata), group) in enumerate(groups.items()):
+            html_fp = '%s/%s.html' % (figures_dir, idx)
+            plot_figures(group, html_fp, data_format=data_format,
+                         domain=domain, manifest=manifest)
+            sections.append((md_fp, strata, len(group),
+                             '%s/%s.html' % (basename(figures_dir), idx)))
+        write_index(sections, distributions)
+        return
+
+    fingerprint = None
+    if manifest is not None:
+        fingerprint = get_fingerprint(figures, domain, data_format)
+        written = manifest.get(abspath(distributions))
+        # skip only if the visualization and its data files are still there
+        if isinstance(written, dict) and written['fingerprint'] == fingerprint and \
+                all(isfile(x) for x in [distributions] + [
+                    os.path.join(dirname(distributions), y) for y in written['data_files']]):
+            return
+
+    data_files = []
+    chart = get_chart(figures, distributions, data_format, domain, data_files)
+
+    # write plot output
+    write_chart(chart, distributions)
+    if manifest is not None:
+        manifest[abspath(distributions)] = {'fingerprint': fingerprint,
+                                            'data_files': data_files}
+
+
+def get_fingerprint(figures: list, domain: list, data_format: str = None) -> str:
+    """
+    Get the fingerprint of the rows of figures of a visualization,
+    which changes whenever their titles, their data, the colored
+    variables or the data format change.
+
+    Parameters
+    ----------
+    figures : list
+        One (title, figure table, binned table) tuple per row of figures.
+    domain : list
+        Numeric variables of all the rows of figures.
+    data_format : str
+        Format of the external data file(s), or None.
+
+    Returns
+    -------
+    fingerprint : str
+        Hash of the rows of figures.
+    """
+    fingerprint = hashlib.sha1()
+    fingerprint.update(repr((altair.__version__, domain, data_format)).encode('utf-8'))
+    for figure in figures:
+        fingerprint.update(figure[0].encode('utf-8'))
+        for table in figure[1:]:
+            if table is None:
+                fingerprint.update(b'None')
+            else:
+                fingerprint.update(repr(table.columns.tolist()).encode('utf-8'))
+                fingerprint.update(pd.util.hash_pandas_object(table).to_numpy().tobytes())
+    fingerprint = fingerprint.hexdigest()
+    return fingerprint
+
+
+def get_chart(figures: list, distributions: str, data_format: str = None,
+              domain: list = None, data_files: list = None):
+    """
+    Make one flat column of rows of interactive figures, all
+    reading the same top-level data, or with external data
+    files, each reading the files of its own tables.
+
+    Parameters
+    ----------
+    figures : list
+        One (title, figure table, binned table) tuple per row of figures.
+    distributions : str
+        Output visualization file path.
+    data_format : str
+        Format of the external data files written next to the
+        visualization ("json" or "csv"), or None to embed the data.
+    domain : list
+        Numeric variables of all the rows of figures, which colors
+        are shared by all the rows (see get_domain).
+    data_files : list
+        Where to collect the names of the external data files
+        read by the visualization (relative to its folder).
+
+    Returns
+    -------
+    chart : altair.VConcatChart
+        Interactive figures.
+    """
+    if domain is None:
+        domain = get_domain(figures)
+    charts = []
+    if data_format:
+        # one file per table: the identical tables of different
+        # rows or visualizations are written (and loaded) once
+        out_dir = dirname(distributions)
+        for title, figure_tab, binned_md in figures:
+            data = [get_data_file(x.assign(median_log10=get_median_log10(x['median'])),
+                                  out_dir, data_format)
+                    for x in [figure_tab, binned_md] if x is not None]
+            if data_files is not None:
+                data_files.extend(x.url for x in data if x.url not in data_files)
+            if binned_md is None:
+                strati_chart = plot_altair(title, figure_tab, domain=domain, data=data[0])
+            else:
+                strati_chart = plot_altair_binned(title, figure_tab, binned_md,
+                                                  domain=domain, data=data)
+            charts.append(strati_chart)
+        return altair.vconcat(*charts)
+
+    for row, (title, figure_tab, binned_md) in enumerate(figures):
+        if binned_md is None:
+            strati_chart = plot_altair(title, figure_tab, row, domain)
+        else:
+            strati_chart = plot_altair_binned(title, figure_tab, binned_md, row, domain)
+        charts.append(strati_chart)
+    chart = altair.vconcat(*charts, data=get_figures_data(figures))
+    return chart
 
-def plot_altair(title: str, figure_tab: pd.DataFrame):
+
+def plot_altair(title: str, figure_tab: pd.DataFrame, row: int = None,
+                domain: list = None, data: altair.UrlData = None):
     """
     Make the Altair interactive figure: one row of
     interactive figures (three panels) for the
@@ -178,6 +688,14 @@ def plot_altair(title: str, figure_tab: pd.DataFrame):
         Title for the row plots.
     figure_tab : pd.DataFrame
         Metadata table ready for plotting.
+    row : int
+        Row of figures in the data of the parent chart (see
+        get_figures_data). If None, the chart embeds figure_tab.
+    domain : list
+        Numeric variables to color (those of figure_tab if None).
+    data : altair.UrlData
+        External data file of figure_tab (see get_data_file),
+        read by the chart instead of embedding figure_tab.
 
     Returns
     -------
@@ -185,15 +703,22 @@ def plot_altair(title: str, figure_tab: pd.DataFrame):
         Group of three panels figure for the current
         metadata table and stratification.
     """
-    figure_tab['median_log10'] = [np.log10(x) if x> 0 else x for x in figure_tab['median']]
+    figure_tab = figure_tab.assign(median_log10=get_median_log10(figure_tab['median']))
 
-    variables = figure_tab.variable.tolist()
-    colors_scale = get_colors(variables)
-    color_scale = altair.Scale(domain=sorted(set(variables)), range=colors_scale)
+    if domain is None:
+        domain = sorted(figure_tab['variable'].unique())
+    color_scale = altair.Scale(domain=domain, range=get_colors(domain))
 
     # Main plot dataset
     brush = altair.selection(type='interval')
-    base = altair.Chart(figure_tab, title=title).properties(
+    if data is not None:
+        base = altair.Chart(data, title=title)
+    elif row is None:
+        base = altair.Chart(figure_tab, title=title)
+    else:
+        base = altair.Chart(title=title).transform_filter(
+            altair.datum.figure == row)
+    base = base.properties(
         width=1100,
         height=400
     ).add_selection(
@@ -240,7 +765,7 @@ def plot_altair(title: str, figure_tab: pd.DataFrame):
 
     # Third panel
     hists = base.mark_bar(opacity=0.7, thickness=100).encode(
-        x=altair.X('value',
+        x=altair.X('value:Q',
                 bin=altair.Bin(maxbins=50)),
         y=altair.Y('count()', stack=None),
         color=altair.Color('variable:N',
@@ -252,3 +777,114 @@ def plot_altair(title: str, figure_tab: pd.DataFrame):
     return chart
 
 
+def plot_altair_binned(title: str, summary_md: pd.DataFrame,
+                       binned_md: pd.DataFrame, row: int = None,
+                       domain: list = None, data: tuple = None):
+    """
+    Make the Altair interactive figure from the pre-computed
+    histograms: one row of interactive figures (three panels)
+    for the current metadata table and stratification.
+
+    Parameters
+    ----------
+    title : str
+        Title for the row plots.
+    summary_md : pd.DataFrame
+        One row per variable with its median and skewness.
+    binned_md : pd.DataFrame
+        One row per non-empty bin per variable.
+    row : int
+        Row of figures in the data of the parent chart (see
+        get_figures_data). If None, the chart embeds the tables.
+    domain : list
+        Numeric variables to color (those of summary_md if None).
+    data : tuple
+        External data files (altair.UrlData) of summary_md and
+        binned_md (see get_data_file), read by the chart instead
+        of embedding the tables.
+
+    Returns
+    -------
+    chart : altair.vegalite.v3.api.HConcatChart
+        Group of three panels figure for the current
+        metadata table and stratification.
+    """
+    summary_md = summary_md.assign(median_log10=get_median_log10(summary_md['median']))
+    binned_md = binned_md.assign(median_log10=get_median_log10(binned_md['median']))
+
+    if domain is None:
+        domain = sorted(summary_md['variable'].unique())
+    color_scale = altair.Scale(domain=domain, range=get_colors(domain))
+
+    # Summary points dataset: the brush is defined on these points
+    # and the fields it selects are carried by each bin
+    brush = altair.selection(type='interval')
+    if data is not None:
+        base = altair.Chart(data[0], title=title)
+        hists_base = altair.Chart(data[1])
+    elif row is None:
+        base = altair.Chart(summary_md, title=title)
+        hists_base = altair.Chart(binned_md)
+    else:
+        base = altair.Chart(title=title).transform_filter(
+            (altair.datum.figure == row) & (altair.datum.kind == 'summary'))
+        hists_base = altair.Chart().transform_filter(
+            (altair.datum.figure == row) & (altair.datum.kind == 'bins'))
+    base = base.properties(
+        width=1100,
+        height=400
+    ).add_selection(
+        brush
+    )
+
+    # First panel
+    points1 = base.mark_point(filled=True, size=100).encode(
+        x=altair.X('median:Q',
+                   scale=altair.Scale(domain=[
+                       min(summary_md['median']),
+                       max(summary_md['median'])
+                   ])),
+        y=altair.Y('skewness:Q',
+                   scale=altair.Scale(domain=[
+                       min(summary_md['skewness']),
+                       max(summary_md['skewness'])]
+                   )),
+        color=altair.condition(brush, 'variable:N',
+                               altair.value('lightgray'),
+                               scale=color_scale,
+                               legend=None),
+        tooltip=['variable:N']
+    ).properties(width=400, height=400)
+
+    # Second panel
+    points2 = base.mark_point(filled=True, size=100).encode(
+        x=altair.X('median_log10:Q',
+                   scale=altair.Scale(domain=[
+                       min(summary_md['median_log10']),
+                       max(summary_md['median_log10'])
+                   ])),
+        y=altair.Y('skewness:Q',
+                   scale=altair.Scale(domain=[
+                       min(summary_md['skewness']),
+                       max(summary_md['skewness'])
+                   ])),
+        color=altair.condition(brush, 'variable:N',
+                               altair.value('lightgray'),
+                               scale=color_scale,
+                               legend=None),
+        tooltip=['variable:N']
+    ).properties(width=400, height=400)
+
+    # Third panel
+    hists = hists_base.mark_bar(opacity=0.7).encode(
+        x=altair.X('bin_start:Q', bin='binned', title='value'),
+        x2='bin_end:Q',
+        y=altair.Y('count:Q', stack=None),
+        color=altair.Color('variable:N',
+                           scale=color_scale,
+                           legend=None),
+        tooltip=['variable:N', 'count:Q']
+    ).transform_filter(brush).properties(width=700, height=400)
+
+    chart = (points1 | points2 | hists)
+    return chart
@@ -0,0 +1,128 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import pandas as pd
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+profile_columns = ['stage', 'path', 'strata', 'wall', 'cpu',
+                   'peak_rss_increase_mb', 'rows', 'columns', 'pid']
+
+
+def get_peak_rss() -> float:
+    """
+    Get the peak resident set size of the current process.
+
+    Returns
+    -------
+    peak_rss : float
+        Peak resident set size (in MB), or None if unknown.
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # in bytes on macOS and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak_rss / 1e6
+    return peak_rss / 1e3
+
+
+@contextmanager
+def profile_stage(profile: list, stage: str, md_fp: str = None,
+                  strata: str = None):
+    """
+    Record the wall time, the CPU time and the increase of the
+    peak resident set size of the process (its high-water mark)
+    for the code running in the context, for the profile report
+    (nothing is recorded if profile is None). The peak resident
+    set size is that of the process lifetime, so that a stage
+    that does not exceed the previous peak records no increase.
+
+    Parameters
+    ----------
+    profile : list
+        List of lists: each nested list is (see profile_columns):
+            [stage, metadata file path, strata, wall time, CPU time,
+             peak RSS increase in MB, number of rows, number of columns, pid]
+    stage : str
+        Name of the stage.
+    md_fp : str
+        Metadata file path.
+    strata : str
+        Variable to stratify on.
+
+    Yields
+    ------
+    record : dict
+        Where to set the 'rows' and 'columns' counts of the stage.
+    """
+    record = {'rows': None, 'columns': None}
+    if profile is None:
+        yield record
+        return
+    wall, cpu, peak_rss = time.perf_counter(), time.process_time(), get_peak_rss()
+    yield record
+    rows, columns = [None if x is None else int(x) for x in
+                     (record['rows'], record['columns'])]
+    if peak_rss is not None:
+        peak_rss = get_peak_rss() - peak_rss
+    profile.append([stage, md_fp, strata, time.perf_counter() - wall,
+                    time.process_time() - cpu, peak_rss,
+                    rows, columns, os.getpid()])
+
+
+def show_profile(profile: list) -> None:
+    """
+    Show the profile report as a table.
+
+    Parameters
+    ----------
+    profile : list
+        List of lists: each nested list is (see profile_columns):
+            [stage, metadata file path, strata, wall time, CPU time,
+             peak RSS increase in MB, number of rows, number of columns, pid]
+    """
+    print()
+    print('[profile]')
+    profile_pd = pd.DataFrame(profile, columns=profile_columns)
+    profile_pd = profile_pd.drop(columns='pid').round(
+        {'wall': 3, 'cpu': 3, 'peak_rss_increase_mb': 1})
+    for column in ['path', 'strata']:
+        profile_pd[column] = ['' if pd.isna(x) else x for x in profile_pd[column]]
+    for column in ['rows', 'columns']:
+        profile_pd[column] = ['' if pd.isna(x) else int(x) for x in profile_pd[column]]
+    print(profile_pd.to_string(index=False, na_rep=''))
+
+
+def write_profile(profile: list, profile_fp: str) -> None:
+    """
+    Write the profile report as a JSON list of records.
+
+    Parameters
+    ----------
+    profile : list
+        List of lists: each nested list is (see profile_columns):
+            [stage, metadata file path, strata, wall time, CPU time,
+             peak RSS increase in MB, number of rows, number of columns, pid]
+    profile_fp : str
+        Output JSON file path.
+    """
+    profile_dir = os.path.dirname(profile_fp)
+    if profile_dir and not os.path.isdir(profile_dir):
+        os.makedirs(profile_dir)
+    with open(profile_fp, 'w') as o:
+        json.dump([dict(zip(profile_columns, x)) for x in profile], o, indent=1)
@@ -0,0 +1,96 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+
+def subset_samples(md_fp: str, factor: str, numerical_md: pd.DataFrame,
+                   number_of_samples: int, logs: list,
+                   rng: np.random.Generator = None) -> pd.DataFrame:
+    """
+    Subset the metadata to a maximum number of samples, selected
+    at random among the samples having the most numerical values
+    (i.e. the fewest np.nan across the numeric variables).
+
+    Parameters
+    ----------
+    md_fp : str
+        Metadata file path.
+    factor : str
+        Stratification factor.
+    numerical_md : pd.DataFrame
+        Numeric variables of the metadata table
+        subset to the current stratification factor.
+    number_of_samples : int
+        Number of samples to randomly select to
+        compute the distributions.
+    logs : list
+        List of lists: each nested list is:
+            [variable, metadata file path, warning message, a number]
+    rng : np.random.Generator
+        Random numbers generator (not seeded if None).
+
+    Returns
+    -------
+    sampled_md : pd.DataFrame
+        Numeric variables of the selected samples (in the metadata order).
+    """
+    n_samples = numerical_md.shape[0]
+    # take either number_of_samples or if less, all the samples
+    if n_samples < number_of_samples:
+        logs.append([factor, md_fp, 'not enough samples', n_samples])
+        return numerical_md
+    if rng is None:
+        rng = np.random.default_rng()
+    # the random part of the keys only breaks the ties between
+    # the samples having the same number of missing values
+    keys = numerical_md.isna().sum(axis=1).to_numpy() + rng.random(n_samples)
+    keep = np.sort(np.argsort(keys, kind='stable')[:number_of_samples])
+    sampled_md = numerical_md.iloc[keep]
+    return sampled_md
+
+
+def reservoir_sample(chunks, max_rows: int,
+                     rng: np.random.Generator = None) -> pd.DataFrame:
+    """
+    Keep a uniform random sample of rows from a stream of tables,
+    in bounded memory: each row gets a random key and only the
+    rows with the smallest keys seen so far are kept.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Stream of pandas DataFrame (e.g. metadata read by chunks).
+    max_rows : int
+        Maximum number of rows to keep (all if None).
+    rng : np.random.Generator
+        Random numbers generator (not seeded if None).
+
+    Returns
+    -------
+    sampled : pd.DataFrame
+        Sampled rows (in the stream order).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    kept, keys = [], []
+    n_rows = 0
+    for chunk in chunks:
+        kept.append(chunk)
+        if max_rows:
+            keys.append(rng.random(chunk.shape[0]))
+            n_rows += chunk.shape[0]
+            if n_rows > max_rows:
+                # keep the rows with the smallest keys, in the stream order
+                sampled = pd.concat(kept)
+                keys = np.concatenate(keys)
+                keep = np.sort(np.argsort(keys, kind='stable')[:max_rows])
+                kept, keys = [sampled.iloc[keep]], [keys[keep]]
+    sampled = pd.concat(kept)
+    return sampled
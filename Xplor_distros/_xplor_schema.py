@@ -0,0 +1,118 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import os
+import json
+import pandas as pd
+
+from Xplor_distros._xplor_dtypes import to_nan_vals, get_dtypes_index
+
+schema_types = {'numeric': 'float', 'categorical': 'object', 'ignore': None}
+
+
+def read_schema(schema_fp: str) -> dict:
+    """
+    Read the type of the metadata variables from a schema file, either
+    in JSON format ({"variables": {variable: type}, "na_values": [...]})
+    or tab-separated ("variable" and "type" columns), where the types
+    are "numeric", "categorical" or "ignore", and where the missing
+    values placeholders are the rows of type "nan" (in JSON, the
+    "na_values", which default to the usual placeholders), if any.
+
+    Parameters
+    ----------
+    schema_fp : str
+        Schema file path.
+
+    Returns
+    -------
+    schema : dict
+        "variables": type of each variable,
+        "na_values": missing values placeholders.
+    """
+    if schema_fp.endswith('.json'):
+        with open(schema_fp) as f:
+            schema = json.load(f)
+        variables = schema.get('variables', {})
+        na_values = schema.get('na_values', sorted(to_nan_vals))
+    else:
+        schema_pd = pd.read_csv(schema_fp, header=0, sep='\t', dtype=str,
+                                keep_default_na=False)
+        is_nan = schema_pd['type'] == 'nan'
+        variables = dict(schema_pd.loc[~is_nan, ['variable', 'type']].values)
+        na_values = schema_pd.loc[is_nan, 'variable'].tolist()
+    unknown = sorted(set(variables.values()) - set(schema_types))
+    if unknown:
+        raise ValueError('Unknown type(s) in schema %s: %s (must be %s)' % (
+            schema_fp, ', '.join(unknown), ', '.join(schema_types)))
+    schema = {'variables': variables, 'na_values': na_values}
+    return schema
+
+
+def get_schema(dtypes: dict, na_values: list = None) -> dict:
+    """
+    Get the schema of the variables from their dtypes in
+    one or several metadata tables: a variable is "numeric"
+    if it is numeric in all the tables, and "categorical" if
+    it is not numeric in at least one table.
+
+    Parameters
+    ----------
+    dtypes : dict
+        Key     = Metadata file path.
+        Value   = Metadata variables' dtypes
+    na_values : list
+        Placeholders of missing values (default ones if None).
+
+    Returns
+    -------
+    schema : dict
+        "variables": type of each variable,
+        "na_values": missing values placeholders.
+    """
+    index = get_dtypes_index(dtypes).drop(columns='conflict')
+    variables = {}
+    for variable, variable_dtypes in index.iterrows():
+        kinds = set(variable_dtypes.dropna())
+        if kinds.issubset({'int', 'float'}):
+            variables[variable] = 'numeric'
+        elif 'object' in kinds:
+            variables[variable] = 'categorical'
+        else:
+            variables[variable] = 'ignore'
+    if na_values is None:
+        na_values = sorted(to_nan_vals)
+    schema = {'variables': variables, 'na_values': list(na_values)}
+    return schema
+
+
+def write_schema(schema: dict, schema_fp: str) -> None:
+    """
+    Write the schema in JSON format if the file name
+    ends with ".json" and tab-separated otherwise.
+
+    Parameters
+    ----------
+    schema : dict
+        "variables": type of each variable,
+        "na_values": missing values placeholders.
+    schema_fp : str
+        Schema file path.
+    """
+    schema_dir = os.path.dirname(schema_fp)
+    if schema_dir and not os.path.isdir(schema_dir):
+        os.makedirs(schema_dir)
+    if schema_fp.endswith('.json'):
+        with open(schema_fp, 'w') as o:
+            json.dump(schema, o, indent=1)
+    else:
+        schema_pd = pd.DataFrame(
+            list(schema['variables'].items()) +
+            [[x, 'nan'] for x in schema['na_values']],
+            columns=['variable', 'type'])
+        schema_pd.to_csv(schema_fp, sep='\t', index=False)
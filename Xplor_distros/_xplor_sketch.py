@@ -0,0 +1,354 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+
+def init_moments(n_variables: int) -> dict:
+    """
+    Create empty moments accumulators.
+
+    Parameters
+    ----------
+    n_variables : int
+        Number of numeric variables.
+
+    Returns
+    -------
+    moments : dict
+        Per variable number of values ('n'), mean ('mean') and
+        sums of the squared ('m2') and cubed ('m3') deviations
+        to the mean.
+    """
+    moments = dict((x, np.zeros(n_variables)) for x in ['n', 'mean', 'm2', 'm3'])
+    return moments
+
+
+def get_chunk_moments(values: np.ndarray) -> dict:
+    """
+    Compute the moments accumulators of a chunk of values.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Values (samples x variables) with np.nan for missing values.
+
+    Returns
+    -------
+    moments : dict
+        Moments accumulators (see init_moments).
+    """
+    finite = ~np.isnan(values)
+    n = finite.sum(axis=0).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(n > 0, np.nansum(values, axis=0) / n, 0.)
+    centered = np.where(finite, values - mean, 0.)
+    squared = centered * centered
+    moments = {'n': n, 'mean': mean, 'm2': squared.sum(axis=0),
+               'm3': (squared * centered).sum(axis=0)}
+    return moments
+
+
+def merge_moments(moments: dict, other: dict) -> dict:
+    """
+    Merge two moments accumulators (pairwise update formulas
+    of Chan et al. and Pebay), which is exact up to the floating
+    point precision whatever the chunks/workers split.
+
+    Parameters
+    ----------
+    moments : dict
+        Moments accumulators (see init_moments).
+    other : dict
+        Moments accumulators (see init_moments).
+
+    Returns
+    -------
+    merged : dict
+        Moments accumulators of the union of the values.
+    """
+    n_a, n_b = moments['n'], other['n']
+    n = n_a + n_b
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = other['mean'] - moments['mean']
+        mean = moments['mean'] + delta * n_b / n
+        m2 = moments['m2'] + other['m2'] + delta ** 2 * n_a * n_b / n
+        m3 = (moments['m3'] + other['m3'] +
+              delta ** 3 * n_a * n_b * (n_a - n_b) / n ** 2 +
+              3 * delta * (n_a * other['m2'] - n_b * moments['m2']) / n)
+    empty = n == 0
+    merged = {'n': n, 'mean': np.where(empty, 0., mean),
+              'm2': np.where(empty, 0., m2), 'm3': np.where(empty, 0., m3)}
+    return merged
+
+
+def get_moments_stats(moments: dict) -> tuple:
+    """
+    Get the statistics from moments accumulators.
+
+    Parameters
+    ----------
+    moments : dict
+        Moments accumulators (see init_moments).
+
+    Returns
+    -------
+    mean : np.ndarray
+        Mean of each variable.
+    std : np.ndarray
+        Standard deviation of each variable (ddof=1).
+    skewness : np.ndarray
+        Skewness of each variable (biased, as scipy.stats.skew).
+    """
+    n, m2, m3 = moments['n'], moments['m2'], moments['m3']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(n > 0, moments['mean'], np.nan)
+        std = np.where(n > 1, np.sqrt(m2 / (n - 1)), np.nan)
+        skewness = np.where(m2 > 0, np.sqrt(n) * m3 / m2 ** 1.5, np.nan)
+    return mean, std, skewness
+
+
+def init_quantiles(k: int = 1024) -> dict:
+    """
+    Create an empty quantiles sketch.
+
+    The sketch keeps levels of values, where each value of level h
+    stands for 2^h values. When a level holds 2k values or more,
+    they are sorted and every other value (from a random first
+    one) moves to the next level. Each such compaction at level h
+    shifts the rank of any value by at most 2^h, and these shifts
+    are summed in 'error': the rank of a returned quantile is thus
+    within 'error' of the true rank, which is at most
+    n * log2(n / k) / (2k) (e.g. 1% of n for k=1024 and n=1e9)
+    and in practice much smaller since the random shifts cancel.
+    The sketch is exact while fewer than 2k values were added.
+
+    Parameters
+    ----------
+    k : int
+        Half of the number of values a level can hold.
+
+    Returns
+    -------
+    sketch : dict
+        Quantiles sketch.
+    """
+    sketch = {'k': k, 'n': 0, 'error': 0, 'levels': [np.array([])]}
+    return sketch
+
+
+def compact_quantiles(sketch: dict, rng: np.random.Generator) -> None:
+    """
+    Compact the full levels of a quantiles sketch.
+
+    Parameters
+    ----------
+    sketch : dict
+        Quantiles sketch (see init_quantiles).
+    rng : np.random.Generator
+        Random numbers generator.
+    """
+    levels = sketch['levels']
+    h = 0
+    while h < len(levels):
+        if levels[h].size >= 2 * sketch['k']:
+            values = np.sort(levels[h])
+            # an odd value out stays at the current level
+            levels[h] = values[values.size - (values.size % 2):]
+            values = values[:values.size - (values.size % 2)]
+            if h + 1 == len(levels):
+                levels.append(np.array([]))
+            levels[h + 1] = np.concatenate([levels[h + 1], values[rng.integers(2)::2]])
+            sketch['error'] += 2 ** h
+        h += 1
+
+
+def update_quantiles(sketch: dict, values: np.ndarray,
+                     rng: np.random.Generator) -> None:
+    """
+    Add values to a quantiles sketch.
+
+    Parameters
+    ----------
+    sketch : dict
+        Quantiles sketch (see init_quantiles).
+    values : np.ndarray
+        Values of one variable, with np.nan for missing values.
+    rng : np.random.Generator
+        Random numbers generator.
+    """
+    values = values[~np.isnan(values)]
+    sketch['n'] += values.size
+    sketch['levels'][0] = np.concatenate([sketch['levels'][0], values])
+    compact_quantiles(sketch, rng)
+
+
+def merge_quantiles(sketch: dict, other: dict,
+                    rng: np.random.Generator) -> dict:
+    """
+    Merge two quantiles sketches (e.g. of two chunks or workers).
+
+    Parameters
+    ----------
+    sketch : dict
+        Quantiles sketch (see init_quantiles).
+    other : dict
+        Quantiles sketch (see init_quantiles).
+    rng : np.random.Generator
+        Random numbers generator.
+
+    Returns
+    -------
+    merged : dict
+        Quantiles sketch of the union of the values.
+    """
+    merged = init_quantiles(max(sketch['k'], other['k']))
+    n_levels = max(len(sketch['levels']), len(other['levels']))
+    merged['levels'] = [np.concatenate([x['levels'][h] for x in [sketch, other]
+                                        if h < len(x['levels'])])
+                        for h in range(n_levels)]
+    merged['n'] = sketch['n'] + other['n']
+    merged['error'] = sketch['error'] + other['error']
+    compact_quantiles(merged, rng)
+    return merged
+
+
+def get_quantile(sketch: dict, q: float) -> float:
+    """
+    Get an approximate quantile from a quantiles sketch.
+
+    Parameters
+    ----------
+    sketch : dict
+        Quantiles sketch (see init_quantiles).
+    q : float
+        Quantile to get (e.g. 0.5 for the median).
+
+    Returns
+    -------
+    quantile : float
+        Value whose rank is within sketch['error'] of q * n.
+    """
+    if not sketch['n']:
+        return np.nan
+    if not sketch['error']:
+        # no compaction yet: all the values are in the sketch
+        return np.quantile(sketch['levels'][0], q)
+    values = np.concatenate(sketch['levels'])
+    weights = np.concatenate([np.full(x.size, 2. ** h)
+                              for h, x in enumerate(sketch['levels'])])
+    order = np.argsort(values, kind='stable')
+    ranks = np.cumsum(weights[order])
+    idx = min(np.searchsorted(ranks, q * ranks[-1]), values.size - 1)
+    quantile = values[order][idx]
+    return quantile
+
+
+def get_chunk_factors(chunk: pd.DataFrame, strata: str, sources: list) -> pd.Series:
+    """
+    Get the factors of a stratification for the samples of a chunk.
+
+    Parameters
+    ----------
+    chunk : pd.DataFrame
+        Metadata table chunk.
+    strata : str
+        Variable to stratify on.
+    sources : list
+        Variables that the stratification is made of (one
+        variable, or the variables merged with "--merge", or
+        none for the dummy 'no_stratification').
+
+    Returns
+    -------
+    factors : pd.Series
+        Factor of each sample.
+    """
+    if strata in chunk.columns:
+        factors = chunk[strata]
+    elif not sources:
+        factors = pd.Series(strata, index=chunk.index)
+    else:
+        # same labels as for the merged variable (see make_merged_columns)
+        sources_md = chunk[sources].astype(object).fillna('nan').astype(str)
+        factors = sources_md[sources[0]].str.cat(
+            [sources_md[x] for x in sources[1:]], sep='__')
+    return factors
+
+
+def get_stats_sketches(chunks, stratas: dict, numerical: list,
+                       k: int = 1024, seed: int = None) -> pd.DataFrame:
+    """
+    Compute the statistics of each numeric variable for all the
+    factors of all the stratifications, by streaming the metadata
+    chunks through exact moments accumulators and approximate
+    quantiles sketches (see init_quantiles for the error bounds).
+
+    Parameters
+    ----------
+    chunks : iterable
+        Metadata table chunks (with parsed numeric variables).
+    stratas : dict
+        Key     = Variable to stratify on.
+        Value   = Variables that the stratification is made of.
+    numerical : list
+        Metadata variables that are numeric.
+    k : int
+        Size parameter of the quantiles sketches.
+    seed : int
+        Seed for the sketches compactions.
+
+    Returns
+    -------
+    stats : pd.DataFrame
+        One row per stratification per factor per numeric variable
+        (same columns as in _xplor_stats.get_stats).
+    """
+    rng = np.random.default_rng(seed)
+    sketches = {}
+    for chunk in chunks:
+        values = chunk[numerical].to_numpy(dtype=float)
+        for strata, sources in stratas.items():
+            factors = get_chunk_factors(chunk, strata, sources)
+            grouped = factors.groupby(factors, observed=True)
+            for factor, idx in grouped.indices.items():
+                if (strata, factor) not in sketches:
+                    sketches[(strata, factor)] = {
+                        'moments': init_moments(len(numerical)),
+                        'quantiles': [init_quantiles(k) for _ in numerical]}
+                sketch = sketches[(strata, factor)]
+                factor_values = values[idx]
+                # the accumulators of each chunk are merged into the running
+                # ones, as would those of chunks streamed by other workers
+                sketch['moments'] = merge_moments(
+                    sketch['moments'], get_chunk_moments(factor_values))
+                for v, variable_values in enumerate(factor_values.T):
+                    chunk_quantiles = init_quantiles(k)
+                    update_quantiles(chunk_quantiles, variable_values, rng)
+                    sketch['quantiles'][v] = merge_quantiles(
+                        sketch['quantiles'][v], chunk_quantiles, rng)
+
+    stats = []
+    for strata in stratas:
+        # the factors of a stratification may not all be of the same type
+        factors = sorted((factor for (s, factor) in sketches if s == strata), key=str)
+        for factor in factors:
+            sketch = sketches[(strata, factor)]
+            mean, std, skewness = get_moments_stats(sketch['moments'])
+            medians = [get_quantile(x, 0.5) for x in sketch['quantiles']]
+            stats.append(pd.DataFrame({
+                'strata': strata, 'factor': factor, 'variable': numerical,
+                'count': sketch['moments']['n'].astype(int), 'mean': mean,
+                'std': std, 'median': medians, 'skewness': skewness}))
+    if not stats:
+        # no factor in any chunk (e.g. no rows)
+        return pd.DataFrame(columns=['strata', 'factor', 'variable', 'count',
+                                     'mean', 'std', 'median', 'skewness'])
+    stats = pd.concat(stats, ignore_index=True)
+    return stats
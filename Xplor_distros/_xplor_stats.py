@@ -0,0 +1,89 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+
+def get_strata_stats(md: pd.DataFrame, strata: str, numerical: list) -> pd.DataFrame:
+    """
+    Compute the statistics of each numeric variable for all
+    the factors of a stratification variable at once, using
+    grouped aggregations over the numeric block of the metadata.
+
+    Parameters
+    ----------
+    md : pd.DataFrame
+        Metadata table.
+    strata : str
+        Variable to stratify on.
+    numerical : list
+        Metadata variables that are numeric.
+
+    Returns
+    -------
+    strata_stats : pd.DataFrame
+        One row per factor per numeric variable, with the number of
+        non-missing values, the mean, standard deviation, median and
+        (biased, as scipy.stats.skew) skewness of the variable.
+    """
+    numerical_md = md[numerical].astype(float)
+    grouped = numerical_md.groupby(md[strata], observed=True)
+    count = grouped.count()
+    mean = grouped.mean()
+    std = grouped.std()
+    median = grouped.median()
+
+    # central moments of each sample's value to its factor's mean
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=int)
+    in_group = codes >= 0
+    centered = numerical_md.to_numpy()[in_group] - mean.to_numpy()[codes[in_group]]
+    squared = centered * centered
+    moments = pd.DataFrame(np.hstack([squared, squared * centered]))
+    moments = moments.groupby(codes[in_group]).mean().to_numpy()
+    m2, m3 = moments[:, :len(numerical)], moments[:, len(numerical):]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skewness = np.where(m2 > 0, m3 / m2 ** 1.5, np.nan)
+
+    n_factors, n_variables = count.shape
+    strata_stats = pd.DataFrame({
+        'strata': strata,
+        'factor': np.repeat(count.index.to_numpy(), n_variables),
+        'variable': np.tile(count.columns.to_numpy(), n_factors),
+        'count': count.to_numpy().ravel(),
+        'mean': mean.to_numpy().ravel(),
+        'std': std.to_numpy().ravel(),
+        'median': median.to_numpy().ravel(),
+        'skewness': skewness.ravel()
+    })
+    return strata_stats
+
+
+def get_stats(md: pd.DataFrame, stratas: list, numerical: list) -> pd.DataFrame:
+    """
+    Compute the statistics of each numeric variable
+    for all the factors of all the stratifications.
+
+    Parameters
+    ----------
+    md : pd.DataFrame
+        Metadata table.
+    stratas : list
+        Variables to stratify on.
+    numerical : list
+        Metadata variables that are numeric.
+
+    Returns
+    -------
+    stats : pd.DataFrame
+        One row per stratification per factor per numeric variable
+        (see get_strata_stats).
+    """
+    stats = pd.concat([get_strata_stats(md, strata, numerical)
+                       for strata in stratas], ignore_index=True)
+    return stats
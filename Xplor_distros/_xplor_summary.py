@@ -0,0 +1,317 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import pandas as pd
+
+from Xplor_distros._xplor_md import (
+    get_metadata_files, get_metadata_chunks, read_meta_chunks,
+    parse_numerical, read_meta_schema)
+from Xplor_distros._xplor_cache import read_cache, write_cache
+from Xplor_distros._xplor_dtypes import (
+    get_dtypes, split_variables_types, get_dtypes_conflicts, get_placeholders, get_nan_values)
+from Xplor_distros._xplot_strata import get_stratification
+from Xplor_distros._xplor_sketch import get_stats_sketches
+from Xplor_distros._xplor_stats import get_stats
+from Xplor_distros._xplor_profile import profile_stage
+from Xplor_distros._xplor_schema import read_schema
+
+
+def get_schema_placeholders(schema_fp: str = None, nan_values: tuple = None,
+                            nan_values_fp: str = None) -> tuple:
+    """
+    Read the schema (if any) and get the placeholders of missing values,
+    i.e. those given directly or in a file added to those of the schema.
+
+    Parameters
+    ----------
+    schema_fp : str
+        Path to a schema file (see _xplor_schema.read_schema), or None.
+    nan_values : tuple
+        Placeholders of missing values.
+    nan_values_fp : str
+        Path to a file with one placeholder of missing values per line.
+
+    Returns
+    -------
+    schema : dict
+        Types of the variables and missing values placeholders
+        (None if no schema file is given).
+    placeholders : list
+        Placeholders of missing values (see _xplor_dtypes.get_placeholders).
+    na_values : list
+        Placeholders of missing values and their case variants.
+    """
+    schema = None
+    if schema_fp:
+        schema = read_schema(schema_fp)
+        # the given placeholders are added to those of the schema
+        schema['na_values'] = get_placeholders(nan_values, nan_values_fp,
+                                               schema['na_values'])
+        placeholders = schema['na_values']
+    else:
+        placeholders = get_placeholders(nan_values, nan_values_fp)
+    na_values = get_nan_values(placeholders)
+    return schema, placeholders, na_values
+
+
+def prepare_metadata(md_fp: str, stratify: tuple, max_strata: int,
+                     merge: bool, logs: list, chunksize: int = None,
+                     max_rows: int = None, cache_dir: str = None,
+                     seed: int = None, profile: list = None,
+                     schema: dict = None, na_values: list = None) -> tuple:
+    """
+    Read one metadata file, get the dtypes of its
+    variables and the variables to stratify on.
+
+    Parameters
+    ----------
+    md_fp : str
+        Path to the metadata file.
+    stratify : tuple
+        Metadata variables on which to split the visualizations.
+    max_strata : int
+        Maximum number of stratification to create.
+    merge : bool
+        Whether to merge multiple stratification variables or not.
+    logs : list
+        List of lists: each nested list is:
+            [variable, metadata file path, warning message, a number]
+    chunksize : int
+        Number of rows per chunk to stream the metadata file
+        (only the numeric and stratification variables are kept).
+    max_rows : int
+        Maximum number of randomly selected rows to keep
+        when streaming by chunks.
+    cache_dir : str
+        Folder where to cache the typed metadata table.
+    seed : int
+        Seed for the random rows selection.
+    profile : list
+        Where to record the time and memory used per stage
+        (see _xplor_profile.profile_stage), or None.
+    schema : dict
+        Types of the variables and missing values placeholders
+        (see _xplor_schema.read_schema), to skip the inference.
+    na_values : list
+        Placeholders of missing values (see _xplor_dtypes.get_nan_values),
+        or None for the default ones (those of the schema if any).
+
+    Returns
+    -------
+    md : pd.DataFrame
+        Metadata table.
+    md_dtypes : dict
+        Key     = Metadata variable.
+        Value   = dtype
+    numerical : list
+        Metadata variables that are numeric.
+    categorical : list
+        Metadata variables that are categorical.
+    stratas : list
+        Variables to stratify on (empty if none).
+    """
+    if chunksize:
+        cache_params = ('chunks', sorted(stratify), max_rows, seed, schema, na_values)
+    else:
+        cache_params = ('memory', schema, na_values)
+    md, md_dtypes = None, None
+    if cache_dir:
+        # Skip the parsing and the dtypes inference if the file is unchanged
+        with profile_stage(profile, 'read_cache', md_fp) as record:
+            md, md_dtypes = read_cache(cache_dir, md_fp, cache_params)
+            if md is not None:
+                record['rows'], record['columns'] = md.shape
+    if md is not None:
+        metadatas, dtypes = {md_fp: md}, {md_fp: md_dtypes}
+    else:
+        if schema:
+            # Read the metadata table with the dtypes of the schema
+            with profile_stage(profile, 'read_meta_schema', md_fp) as record:
+                md, md_dtypes = read_meta_schema(md_fp, schema, chunksize,
+                                                 max_rows, seed)
+                metadatas, dtypes = {md_fp: md}, {md_fp: md_dtypes}
+                record['rows'], record['columns'] = md.shape
+        elif chunksize:
+            # Stream the metadata table to get the dtypes and the needed columns
+            with profile_stage(profile, 'get_metadata_chunks', md_fp) as record:
+                metadatas, dtypes = get_metadata_chunks((md_fp,), stratify, chunksize,
+                                                        max_rows, seed, na_values)
+                record['rows'], record['columns'] = metadatas[md_fp].shape
+        else:
+            # Collect the metadata table as pandas DataFrame
+            with profile_stage(profile, 'read_meta_pd', md_fp) as record:
+                metadatas = get_metadata_files((md_fp,), na_values)
+                record['rows'], record['columns'] = metadatas[md_fp].shape
+            # Get the dtypes of each column for the metadata table
+            with profile_stage(profile, 'get_dtypes', md_fp) as record:
+                dtypes = get_dtypes(metadatas, na_values)
+                record['rows'], record['columns'] = metadatas[md_fp].shape
+        if cache_dir:
+            with profile_stage(profile, 'write_cache', md_fp):
+                write_cache(cache_dir, md_fp, metadatas[md_fp],
+                            dtypes[md_fp], cache_params)
+    numerical, categorical = split_variables_types(dtypes)
+    # Get categorical metadata variables to stratify on
+    with profile_stage(profile, 'get_stratification', md_fp) as record:
+        stratas = get_stratification(metadatas, categorical, stratify,
+                                     max_strata, merge, logs)
+        record['rows'] = metadatas[md_fp].shape[0]
+        record['columns'] = len(stratas.get(md_fp, []))
+    md = metadatas[md_fp]
+    return (md, dtypes[md_fp], numerical.get(md_fp, []),
+            categorical.get(md_fp, []), stratas.get(md_fp, []))
+
+
+def get_approx_stats(md_fp: str, md: pd.DataFrame, stratas: list,
+                     numerical: list, categorical: list, stratify: tuple,
+                     chunksize: int = None, seed: int = None,
+                     na_values: list = None) -> pd.DataFrame:
+    """
+    Stream the statistics of the numeric variables for all the
+    factors of all the stratifications of one metadata file.
+
+    Parameters
+    ----------
+    md_fp : str
+        Metadata file path.
+    md : pd.DataFrame
+        Metadata table.
+    stratas : list
+        Variables to stratify on.
+    numerical : list
+        Metadata variables that are numeric.
+    categorical : list
+        Metadata variables that are categorical.
+    stratify : tuple
+        Metadata variables on which to split the visualizations.
+    chunksize : int
+        Number of rows per chunk to stream the metadata file
+        (all the rows, even if only some were kept in the table),
+        or None to use the in-memory metadata table.
+    seed : int
+        Seed for the quantiles sketches.
+    na_values : list
+        Placeholders of missing values (see _xplor_dtypes.get_nan_values).
+
+    Returns
+    -------
+    stats : pd.DataFrame
+        One row per stratification per factor per numeric variable.
+    """
+    possible_stratas = [x for x in stratify if x in categorical]
+    sources = {}
+    for strata in stratas:
+        if strata == 'no_stratification':
+            sources[strata] = []
+        elif strata in possible_stratas:
+            sources[strata] = [strata]
+        else:
+            # merged stratification variables
+            sources[strata] = possible_stratas
+    if chunksize:
+        usecols = numerical + [x for x in possible_stratas if x not in numerical]
+        chunks = parse_numerical(read_meta_chunks(
+            md_fp, chunksize, usecols, na_values), numerical)
+    else:
+        chunks = [md]
+    stats = get_stats_sketches(chunks, sources, numerical, seed=seed)
+    return stats
+
+
+def summarize(metadata_files: tuple, stratify: tuple = (), max_strata: int = 20,
+              merge: bool = False, chunksize: int = None, max_rows: int = None,
+              cache_dir: str = None, seed: int = None, approx: bool = False,
+              output: str = None, logs: list = None, schema: str = None,
+              nan_values: tuple = None, nan_values_fp: str = None) -> pd.DataFrame:
+    """
+    Get the statistics of the numeric variables for each factor of
+    each stratification of each metadata file, without making the
+    visualization (i.e. the median and skewness shown in the figures).
+
+    Parameters
+    ----------
+    metadata_files : tuple
+        Paths to the metadata files.
+    stratify : tuple
+        Metadata variables on which to split the statistics.
+    max_strata : int
+        Maximum number of stratification to create.
+    merge : bool
+        Whether to merge multiple stratification variables or not.
+    chunksize : int
+        Number of rows per chunk to stream the metadata files
+        (only the numeric and stratification variables are kept).
+    max_rows : int
+        Maximum number of randomly selected rows to keep
+        per metadata file when streaming by chunks.
+    cache_dir : str
+        Folder where to cache the typed metadata tables.
+    seed : int
+        Seed for the random rows selection.
+    approx : bool
+        Whether to stream the statistics of all the rows through
+        mergeable accumulators (exact moments, approximate medians).
+    output : str
+        Path to the output table: Parquet if it ends with ".parquet"
+        (requires pyarrow or fastparquet), otherwise tab-separated.
+    logs : list
+        Where to collect the warnings (variables not categorical, with
+        too many factors, with different dtypes across the files, etc),
+        as lists of:
+            [variable, metadata file path, warning message, a number]
+    schema : str
+        Path to a schema file giving the type of the variables
+        (see _xplor_schema.read_schema), to skip the inference.
+    nan_values : tuple
+        Placeholders of missing values, matched case-insensitively
+        and read as NaN (default: "Unknown", "Not applicable", etc),
+        added to those of the schema if any.
+    nan_values_fp : str
+        Path to a file with one placeholder of missing values per line.
+
+    Returns
+    -------
+    summary : pd.DataFrame
+        One row per metadata file per stratification per factor per
+        numeric variable, with columns "path", "strata", "factor",
+        "variable", "count", "mean", "std", "median" and "skewness".
+    """
+    if logs is None:
+        logs = []
+    schema, placeholders, na_values = get_schema_placeholders(
+        schema, nan_values, nan_values_fp)
+    summaries, dtypes = [], {}
+    for md_fp in dict.fromkeys(metadata_files):
+        md, dtypes[md_fp], numerical, categorical, stratas = prepare_metadata(
+            md_fp, stratify, max_strata, merge, logs, chunksize,
+            max_rows, cache_dir, seed, schema=schema, na_values=na_values)
+        if not stratas:
+            continue
+        if approx:
+            stats = get_approx_stats(md_fp, md, stratas, numerical, categorical,
+                                     stratify, chunksize, seed, na_values)
+        else:
+            stats = get_stats(md, stratas, numerical)
+        summaries.append(stats.assign(path=md_fp, factor=stats['factor'].astype(str)))
+
+    # variables not numeric in all the files are only partly summarized
+    get_dtypes_conflicts(dtypes, logs)
+
+    columns = ['path', 'strata', 'factor', 'variable', 'count',
+               'mean', 'std', 'median', 'skewness']
+    if summaries:
+        summary = pd.concat(summaries, ignore_index=True)[columns]
+    else:
+        summary = pd.DataFrame(columns=columns)
+
+    if output:
+        if output.endswith('.parquet'):
+            summary.to_parquet(output, index=False)
+        else:
+            summary.to_csv(output, sep='\t', index=False)
+    return summary
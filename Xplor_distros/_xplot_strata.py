@@ -51,7 +51,125 @@ def get_possible_stratas(metadatas: dict, categorical: dict,
     return possible_stratas
 
 
-def make_merged_columns(md: pd.DataFrame, strata_: list) -> str:
+def count_factors(factors: pd.Series, max_strata: int,
+                  block_size: int = 10000) -> int:
+    """
+    Count the distinct factors of a variable (missing values
+    excluded) by blocks of samples, stopping as soon as more
+    than the maximum number of stratification are found.
+
+    Parameters
+    ----------
+    factors : pd.Series
+        Factors of the metadata variable.
+    max_strata : int
+        Maximum number of stratification to create.
+    block_size : int
+        Number of samples per block.
+
+    Returns
+    -------
+    n_factors : int
+        Number of distinct factors (a lower bound if
+        more than the maximum number of stratification).
+    """
+    distinct = set()
+    for start in range(0, factors.size, block_size):
+        block = factors.iloc[start:(start + block_size)]
+        distinct.update(block.dropna().unique().tolist())
+        if len(distinct) > max_strata:
+            break
+    n_factors = len(distinct)
+    return n_factors
+
+
+def make_categorical(md: pd.DataFrame, strata: str) -> None:
+    """
+    Convert a stratification variable to a pandas
+    Categorical made of its observed factors only.
+
+    Parameters
+    ----------
+    md : pd.DataFrame
+        Metadata table.
+    strata : str
+        Variable to stratify on.
+    """
+    if isinstance(md[strata].dtype, pd.CategoricalDtype):
+        md[strata] = md[strata].cat.remove_unused_categories()
+    else:
+        md[strata] = md[strata].astype('category')
+
+
+def get_merged_codes(md: pd.DataFrame, strata_: list) -> tuple:
+    """
+    Encode the combinations of the factors of multiple
+    variables from their categories codes, without
+    building the combinations labels.
+
+    Parameters
+    ----------
+    md : pd.DataFrame
+        Metadata table.
+    strata_ : list
+        Variables to stratify on (pandas Categorical).
+
+    Returns
+    -------
+    combined : np.ndarray
+        Code of the factors combination of each sample (the
+        combinations are numbered in order of occurrence).
+    decoders : list
+        For each variable, its categories and the unique codes
+        combining the previous variables' combination and the
+        variable's category code.
+    """
+    combined = np.zeros(md.shape[0], dtype=np.int64)
+    decoders = []
+    for strata in strata_:
+        factors = md[strata]
+        if factors.isna().any():
+            # missing values are a factor, as for the other factors
+            if 'nan' not in factors.cat.categories:
+                factors = factors.cat.add_categories(['nan'])
+            factors = factors.fillna('nan')
+        categories = factors.cat.categories.astype(str).to_numpy()
+        codes = factors.cat.codes.to_numpy(dtype=np.int64)
+        # renumber the combinations so far to keep the codes small
+        combined, uniques = pd.factorize(combined * categories.size + codes)
+        decoders.append((categories, uniques))
+    return combined, decoders
+
+
+def decode_merged_codes(decoders: list) -> list:
+    """
+    Get the categories codes of each variable for
+    each occurring combination of factors.
+
+    Parameters
+    ----------
+    decoders : list
+        For each variable, its categories and the unique codes
+        combining the previous variables' combination and the
+        variable's category code.
+
+    Returns
+    -------
+    strata_codes : list
+        For each variable, the category code in each combination.
+    """
+    ids = np.arange(decoders[-1][1].size)
+    strata_codes = []
+    # from the last variable to the first
+    for categories, uniques in decoders[::-1]:
+        ids, codes = np.divmod(uniques[ids], categories.size)
+        strata_codes.insert(0, codes)
+    return strata_codes
+
+
+def make_merged_columns(md: pd.DataFrame, strata_: list,
+                        merged_codes: tuple = None,
+                        observed: bool = True) -> str:
     """
     Join variables contents for multiple,
     merged combination stratification.
@@ -61,7 +179,13 @@ def make_merged_columns(md: pd.DataFrame, strata_: list) -> str:
     md : pd.DataFrame
         Metadata table.
     strata_ : list
-        Variables to stratify on.
+        Variables to stratify on (pandas Categorical).
+    merged_codes : tuple
+        Combinations codes and decoders (see get_merged_codes),
+        computed if None.
+    observed : bool
+        Whether the categories of the created variable are only
+        the occurring combinations of factors, or all of them.
 
     Returns
     -------
@@ -69,7 +193,20 @@ def make_merged_columns(md: pd.DataFrame, strata_: list) -> str:
         Name of the variable created from joined variables.
     """
     new_column = '__'.join(strata_)
-    md[new_column] = md[strata_].fillna('nan').agg('__'.join, axis=1)
+    if merged_codes is None:
+        merged_codes = get_merged_codes(md, strata_)
+    combined, decoders = merged_codes
+    categories = [x[0] for x in decoders]
+    strata_codes = decode_merged_codes(decoders)
+    if not observed:
+        # all the combinations of factors, including those with no sample
+        shape = [x.size for x in categories]
+        combined = np.ravel_multi_index(strata_codes, shape)[combined]
+        strata_codes = np.unravel_index(np.arange(np.prod(shape)), shape)
+    labels = ['__'.join(x) for x in zip(*[
+        x[codes] for x, codes in zip(categories, strata_codes)])]
+    merged = pd.Categorical.from_codes(combined, labels)
+    md[new_column] = merged.reorder_categories(sorted(labels))
     return new_column
 
 
@@ -105,18 +242,31 @@ def get_stratas(metadatas: dict, possible_stratas: dict,
     stratas = {}
     for md_fp, strata_ in possible_stratas.items():
         md = metadatas[md_fp]
+        # variables with too many factors are not fully counted
+        too_many = [s for s in strata_ if count_factors(md[s], max_strata) > max_strata]
         if merge:
-            new_column = make_merged_columns(md, strata_)
-            strata = [new_column]
-        else:
-            strata = strata_
-
-        for s in strata:
-            n_factors = md[s].value_counts().size
+            if too_many:
+                # the combinations are at least as many as any variable's factors
+                logs.append(['__'.join(strata_), md_fp, 'too many factors',
+                             '>%s' % max_strata])
+                continue
+            for s in strata_:
+                make_categorical(md, s)
+            # only decode the factors labels if there are not too many
+            merged_codes = get_merged_codes(md, strata_)
+            n_factors = merged_codes[1][-1][1].size
             if n_factors > max_strata:
-                logs.append([s, md_fp, 'too many factors', n_factors])
+                logs.append(['__'.join(strata_), md_fp, 'too many factors', n_factors])
                 continue
-            stratas.setdefault(md_fp, []).append(s)
+            new_column = make_merged_columns(md, strata_, merged_codes)
+            stratas.setdefault(md_fp, []).append(new_column)
+        else:
+            for s in strata_:
+                if s in too_many:
+                    logs.append([s, md_fp, 'too many factors', '>%s' % max_strata])
+                    continue
+                make_categorical(md, s)
+                stratas.setdefault(md_fp, []).append(s)
     return stratas
 
 
@@ -139,7 +289,8 @@ def get_dummy_stratas(metadatas: dict) -> dict:
     """
     stratas = {}
     for md_fp, md in metadatas.items():
-        md['no_stratification'] = 'no_stratification'
+        md['no_stratification'] = pd.Categorical.from_codes(
+            np.zeros(md.shape[0], dtype=int), ['no_stratification'])
         stratas[md_fp] = ['no_stratification']
     return stratas
 
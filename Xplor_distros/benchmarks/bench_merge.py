@@ -0,0 +1,95 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import time
+import numpy as np
+import pandas as pd
+
+from Xplor_distros._xplot_strata import make_categorical, make_merged_columns
+
+
+def make_merge_md(n_samples: int, n_stratas: int,
+                  n_factors: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Make a metadata table of categorical variables
+    (with 1% of missing values).
+
+    Parameters
+    ----------
+    n_samples : int
+        Number of samples (rows).
+    n_stratas : int
+        Number of categorical variables.
+    n_factors : int
+        Number of factors per categorical variable.
+    seed : int
+        Seed for the random factors.
+
+    Returns
+    -------
+    md : pd.DataFrame
+        Metadata table.
+    """
+    rng = np.random.default_rng(seed)
+    factors = np.array(['factor_%s' % x for x in range(n_factors)], dtype=object)
+    md = pd.DataFrame(dict(
+        ('cat_%s' % x, factors[rng.integers(n_factors, size=n_samples)])
+        for x in range(n_stratas)))
+    md = md.mask(rng.random(md.shape) < 0.01)
+    return md
+
+
+def bench_merge(n_samples: int = 1000000, n_stratas: int = 4,
+                n_factors: int = 5, join: bool = True) -> pd.DataFrame:
+    """
+    Time the creation of the merged stratification variable from
+    the variables' categories codes, versus the row-wise join of
+    the variables' contents.
+
+    Parameters
+    ----------
+    n_samples : int
+        Number of samples (rows).
+    n_stratas : int
+        Number of categorical variables to merge.
+    n_factors : int
+        Number of factors per categorical variable.
+    join : bool
+        Whether to also time the row-wise join.
+
+    Returns
+    -------
+    timings : pd.DataFrame
+        Time (in seconds) per method.
+    """
+    md = make_merge_md(n_samples, n_stratas, n_factors)
+    strata_ = md.columns.tolist()
+    timings = []
+
+    start = time.perf_counter()
+    for strata in strata_:
+        make_categorical(md, strata)
+    timings.append(['categorical', time.perf_counter() - start])
+
+    for observed in [True, False]:
+        start = time.perf_counter()
+        make_merged_columns(md, strata_, observed=observed)
+        timings.append(['codes (observed=%s)' % observed, time.perf_counter() - start])
+
+    if join:
+        md = md[strata_].astype(object)
+        start = time.perf_counter()
+        md[strata_].fillna('nan').agg('__'.join, axis=1)
+        timings.append(['row-wise join', time.perf_counter() - start])
+
+    timings = pd.DataFrame(timings, columns=['method', 'seconds'])
+    return timings
+
+
+if __name__ == '__main__':
+    print(bench_merge().to_string(index=False))
@@ -0,0 +1,163 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import time
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from Xplor_distros._xplor_md import read_meta_pd
+from Xplor_distros._xplor_dtypes import get_dtypes, split_variables_types, to_nan_vals
+from Xplor_distros._xplot_strata import get_stratification
+from Xplor_distros._xplor_plot import get_figures, get_chart, write_chart
+
+
+def make_metadata(n_samples: int, n_numeric: int = 20, n_categorical: int = 2,
+                  n_check: int = 2, nan_rate: float = 0.05, n_factors: int = 5,
+                  seed: int = 0) -> pd.DataFrame:
+    """
+    Make a metadata table of random numeric variables, categorical
+    variables and numeric variables "polluted" by missing values
+    placeholders (i.e. the 'check' variables of get_dtypes).
+
+    Parameters
+    ----------
+    n_samples : int
+        Number of samples (rows).
+    n_numeric : int
+        Number of numeric variables.
+    n_categorical : int
+        Number of categorical variables.
+    n_check : int
+        Number of numeric variables with placeholders.
+    nan_rate : float
+        Proportion of missing values in the numeric variables.
+    n_factors : int
+        Number of factors of each categorical variable.
+    seed : int
+        Seed for the random values.
+
+    Returns
+    -------
+    md : pd.DataFrame
+        Metadata table.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.Index(['sample.%s' % x for x in range(n_samples)], name='#SampleID')
+    numeric = rng.lognormal(size=(n_samples, n_numeric + n_check))
+    numeric[rng.random(numeric.shape) < nan_rate] = np.nan
+    md = pd.DataFrame(numeric[:, :n_numeric], index=index,
+                      columns=['num_%s' % x for x in range(n_numeric)])
+    placeholders = sorted(to_nan_vals)
+    for check in range(n_check):
+        values = pd.Series(numeric[:, n_numeric + check], index=index, dtype=object)
+        polluted = rng.random(n_samples) < nan_rate
+        values[polluted] = rng.choice(placeholders, polluted.sum())
+        md['check_%s' % check] = values
+    for cat in range(n_categorical):
+        md['cat_%s' % cat] = ['cat_%s_%s' % (cat, x) for x in
+                              rng.integers(n_factors, size=n_samples)]
+    return md
+
+
+def run_stage(stage: str, timings: list, func, *args):
+    """
+    Run one stage of the pipeline and collect its
+    wall time and its peak of traced memory.
+
+    Parameters
+    ----------
+    stage : str
+        Name of the stage.
+    timings : list
+        List of lists: each nested list is:
+            [stage, seconds, peak memory in MB]
+    func : callable
+        Function running the stage.
+    args
+        Arguments of the function.
+
+    Returns
+    -------
+    result
+        Returned value of the function.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    timings.append([stage, seconds, peak / 1e6])
+    return result
+
+
+def bench_stages(sizes: tuple = (1000, 10000, 100000), n_numeric: int = 20,
+                 n_categorical: int = 2, n_check: int = 2, nan_rate: float = 0.05,
+                 n_factors: int = 5, number_of_samples: int = 100,
+                 aggregate: bool = True) -> pd.DataFrame:
+    """
+    Time each stage of the pipeline (reading, dtypes inference,
+    stratification, figures and chart making, chart saving) for
+    synthetic metadata files of increasing numbers of samples.
+    The memory peaks are those traced by tracemalloc (Python and
+    numpy allocations), which also slows down the stages a bit.
+
+    Parameters
+    ----------
+    sizes : tuple
+        Numbers of samples (rows) to benchmark.
+    n_numeric : int
+        Number of numeric variables.
+    n_categorical : int
+        Number of categorical variables (all used to stratify).
+    n_check : int
+        Number of numeric variables with placeholders.
+    nan_rate : float
+        Proportion of missing values in the numeric variables.
+    n_factors : int
+        Number of factors of each categorical variable.
+    number_of_samples : int
+        Number of samples to randomly select to compute the distributions.
+    aggregate : bool
+        Whether to pre-compute the histograms.
+
+    Returns
+    -------
+    timings : pd.DataFrame
+        Time (in seconds) and memory peak (in MB) per stage
+        per number of samples.
+    """
+    stratify = tuple('cat_%s' % x for x in range(n_categorical))
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_samples in sizes:
+            md_fp = '%s/metadata_%s.tsv' % (tmp, n_samples)
+            make_metadata(n_samples, n_numeric, n_categorical, n_check,
+                          nan_rate, n_factors).to_csv(md_fp, sep='\t')
+            stages, logs = [], []
+            md = run_stage('read_meta_pd', stages, read_meta_pd, md_fp)
+            metadatas = {md_fp: md}
+            dtypes = run_stage('get_dtypes', stages, get_dtypes, metadatas)
+            numerical, categorical = split_variables_types(dtypes)
+            stratas = run_stage('get_stratification', stages, get_stratification,
+                                metadatas, categorical, stratify, n_factors,
+                                False, logs)
+            out_fp = '%s/distributions_%s.html' % (tmp, n_samples)
+            chart = run_stage('get_chart', stages, lambda: get_chart(get_figures(
+                md_fp, md, stratas[md_fp], numerical[md_fp],
+                number_of_samples, logs, aggregate), out_fp))
+            run_stage('chart.save', stages, write_chart, chart, out_fp)
+            timings.extend([n_samples] + stage for stage in stages)
+    timings = pd.DataFrame(timings, columns=['samples', 'stage', 'seconds', 'peak_mb'])
+    return timings
+
+
+if __name__ == '__main__':
+    print(bench_stages().to_string(index=False))
@@ -0,0 +1,137 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import time
+import numpy as np
+import pandas as pd
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+from Xplor_distros._xplor_stats import get_stats
+from Xplor_distros._xplor_plot import get_figure
+
+
+def make_strata_md(n_samples: int, n_variables: int,
+                   n_factors: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Make a metadata table of random numeric variables
+    and one stratification variable.
+
+    Parameters
+    ----------
+    n_samples : int
+        Number of samples (rows).
+    n_variables : int
+        Number of numeric variables.
+    n_factors : int
+        Number of factors of the 'strata' variable.
+    seed : int
+        Seed for the random values.
+
+    Returns
+    -------
+    md : pd.DataFrame
+        Metadata table.
+    """
+    rng = np.random.default_rng(seed)
+    md = pd.DataFrame(
+        rng.lognormal(size=(n_samples, n_variables)),
+        index=pd.Index(['sample.%s' % x for x in range(n_samples)], name='sample_name'),
+        columns=['num_%s' % x for x in range(n_variables)])
+    md['strata'] = ['factor_%s' % x for x in rng.integers(n_factors, size=n_samples)]
+    return md
+
+
+def get_factors_figures(md: pd.DataFrame, numerical: list, number_of_samples: int,
+                        aggregate: bool, jobs: int = 1) -> list:
+    """
+    Get the figures data of the factors of the 'strata' variable,
+    serially or in a pool of processes (one task per factor).
+
+    Parameters
+    ----------
+    md : pd.DataFrame
+        Metadata table.
+    numerical : list
+        Metadata variables that are numeric.
+    number_of_samples : int
+        Number of samples to randomly select to compute the distributions.
+    aggregate : bool
+        Whether to pre-compute the histograms.
+    jobs : int
+        Number of processes (serial if 1).
+
+    Returns
+    -------
+    results : list
+        (figure, logs) per factor (see _xplor_plot.get_figure).
+    """
+    stats = get_stats(md, ['strata'], numerical)
+    factors = md[numerical].groupby(md['strata'])
+    summaries = [stats.loc[stats['factor'] == x, ['variable', 'median', 'skewness']]
+                 for x in factors.groups]
+    rngs = [np.random.default_rng(x) for x in range(factors.ngroups)]
+    args = (repeat('bench'), repeat('bench'), list(factors.groups),
+            [x for _, x in factors], summaries, repeat(number_of_samples),
+            repeat(aggregate), rngs)
+    if jobs == 1:
+        return list(map(get_figure, *args))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(get_figure, *args))
+
+
+def bench_strata(strata_counts: tuple = (1, 10, 50, 200),
+                 jobs: int = 4, n_samples: int = 20000,
+                 n_variables: int = 50, number_of_samples: int = 100,
+                 aggregate: bool = True) -> pd.DataFrame:
+    """
+    Time the computation of the figures data for an increasing
+    number of stratification factors, serially and in a pool of
+    processes, to check whether computing the factors in parallel
+    pays off (the figures are computed serially since the work per
+    factor is a few milliseconds, i.e. of the order of the cost of
+    sending the factor's table to a worker process).
+
+    Parameters
+    ----------
+    strata_counts : tuple
+        Numbers of stratification factors to benchmark.
+    jobs : int
+        Number of processes for the parallel run.
+    n_samples : int
+        Number of samples (rows).
+    n_variables : int
+        Number of numeric variables.
+    number_of_samples : int
+        Number of samples to randomly select to compute the distributions.
+    aggregate : bool
+        Whether to pre-compute the histograms.
+
+    Returns
+    -------
+    timings : pd.DataFrame
+        Serial and parallel times (in seconds) and speedup
+        per number of stratification factors.
+    """
+    timings = []
+    for n_factors in strata_counts:
+        md = make_strata_md(n_samples, n_variables, n_factors)
+        numerical = md.columns[:-1].tolist()
+        times = []
+        for n_jobs in [1, jobs]:
+            start = time.perf_counter()
+            get_factors_figures(md, numerical, number_of_samples, aggregate, n_jobs)
+            times.append(time.perf_counter() - start)
+        timings.append([n_factors, times[0], times[1], times[0] / times[1]])
+    timings = pd.DataFrame(timings, columns=[
+        'factors', 'serial', 'jobs=%s' % jobs, 'speedup'])
+    return timings
+
+
+if __name__ == '__main__':
+    print(bench_strata().to_string(index=False))
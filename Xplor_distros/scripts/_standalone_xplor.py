@@ -8,8 +8,7 @@
 
 import click
 
-from Xports import __version__
-from Xplor_distros._xplor_distros import xplor_distros
+from Xplor_distros import __version__
 
 
 @click.command()
@@ -45,6 +44,97 @@ from Xplor_distros._xplor_distros import xplor_distros
          "combined factors: 'Male__Yes', 'Female__Yes', "
          "'Male_No', 'Female__No'."
 )
+@click.option(
+    "--aggregate/--no-aggregate", default=False, show_default=True,
+    help="Pre-compute the histograms of all the samples and only "
+         "write the bins and the per-variable summaries in the "
+         "visualization (for metadata with many samples/variables)."
+)
+@click.option(
+    "--p-chunksize", required=False, default=None, type=int,
+    show_default=True, help="Number of rows per chunk to stream the "
+                            "metadata files with (only the numeric and "
+                            "stratification variables are then loaded)."
+)
+@click.option(
+    "--p-max-rows", required=False, default=None, type=int,
+    show_default=True, help="Maximum number of randomly selected rows "
+                            "to load per metadata file (with "
+                            "--p-chunksize)."
+)
+@click.option(
+    "--cache-dir", required=False, default=None,
+    help="Folder where to cache the parsed and typed metadata "
+         "tables and the figures data, to skip parsing, inference "
+         "and computations when a metadata file has not changed "
+         "since a previous run (only the visualizations of changed "
+         "figures are then written again)."
+)
+@click.option(
+    "--split/--no-split", default=False, show_default=True,
+    help="Write one visualization per metadata file and "
+         "stratification in a folder next to the output "
+         "visualization file, which is then an index page "
+         "loading each visualization on demand."
+)
+@click.option(
+    "--p-data-format", required=False, default=None,
+    type=click.Choice(['json', 'csv']),
+    help="Write the data of each figure in an external file of this "
+         "format next to the visualization file(s) instead of embedding "
+         "it (identical tables, e.g. across files or stratifications, "
+         "are written once; the visualization must then be served, "
+         "e.g. 'python -m http.server')."
+)
+@click.option(
+    "--p-seed", required=False, default=None, type=int,
+    show_default=True, help="Seed for the random selections of "
+                            "samples (and rows, with --p-max-rows)."
+)
+@click.option(
+    "--approx/--exact", default=False, show_default=True,
+    help="Stream the per-factor statistics of all the rows through "
+         "mergeable accumulators: exact moments but approximate "
+         "medians (rank error bounded, see README)."
+)
+@click.option(
+    "--profile/--no-profile", default=False, show_default=True,
+    help="Show the wall time, CPU time, peak memory increase and numbers of "
+         "rows/columns of each stage (per metadata file and strata)."
+)
+@click.option(
+    "--o-profile", required=False, default=None,
+    help="Output JSON file for the stages profile (implies --profile)."
+)
+@click.option(
+    "--schema", required=False, default=None,
+    help="Schema file giving the type of the metadata variables "
+         "(\"numeric\", \"categorical\" or \"ignore\") and the "
+         "missing values placeholders, to skip the types inference "
+         "(tab-separated, or JSON if ending with \".json\")."
+)
+@click.option(
+    "--o-schema", required=False, default=None,
+    help="Output schema file of the inferred types, for reuse "
+         "with --schema (JSON if ending with \".json\")."
+)
+@click.option(
+    "--p-nan-value", required=False, multiple=True, default=None,
+    help="Placeholder of missing values, read as NaN whatever its case "
+         "(can be repeated; default: \"Unknown\", \"Unspecified\", "
+         "\"Not provided\", \"Not applicable\" and \"Missing\"; "
+         "added to those of --schema)."
+)
+@click.option(
+    "--nan-values-file", required=False, default=None,
+    help="File with one placeholder of missing values per line "
+         "(added to those given with --p-nan-value)."
+)
+@click.option(
+    "-j", "--p-jobs", required=False, default=1, type=int,
+    show_default=True, help="Number of metadata files to process "
+                            "in parallel (one process per file)."
+)
 @click.version_option(__version__, prog_name="Xplor_distros")
 
 
@@ -54,8 +144,26 @@ def standalone_xplor(
         p_number_of_samples,
         o_distributions,
         p_max_strata,
-        merge
+        merge,
+        aggregate,
+        p_chunksize,
+        p_max_rows,
+        cache_dir,
+        split,
+        p_data_format,
+        p_seed,
+        approx,
+        profile,
+        o_profile,
+        schema,
+        o_schema,
+        p_nan_value,
+        nan_values_file,
+        p_jobs
 ):
+    # imported here for "--help" and "--version" not to wait
+    # for pandas, numpy and altair to be imported (~2s)
+    from Xplor_distros._xplor_distros import xplor_distros
 
     xplor_distros(
         m_metadata_file,
@@ -63,7 +171,22 @@ def standalone_xplor(
         p_number_of_samples,
         o_distributions,
         p_max_strata,
-        merge
+        merge,
+        aggregate,
+        p_chunksize,
+        p_max_rows,
+        cache_dir,
+        split,
+        p_data_format,
+        p_seed,
+        approx,
+        profile,
+        o_profile,
+        schema,
+        o_schema,
+        p_nan_value or None,
+        nan_values_file,
+        p_jobs
     )
 
 
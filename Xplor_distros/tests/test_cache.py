@@ -0,0 +1,82 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from os.path import dirname, join
+
+from Xplor_distros._xplor_cache import (
+    get_cache_key, read_cache, write_cache, read_figures_cache,
+    write_figures_cache)
+from Xplor_distros._xplor_plot import get_figures
+from Xplor_distros._xplor_summary import prepare_metadata
+
+metadata_fp = join(dirname(__file__), 'metadata', 'metadata.tsv')
+
+
+@pytest.fixture
+def prepared():
+    logs = []
+    md, dtypes, numerical, categorical, stratas = prepare_metadata(
+        metadata_fp, ('cat_1', 'cat_2'), 20, False, logs)
+    return md, dtypes, numerical, stratas
+
+
+def test_cache_round_trip(tmp_path, prepared):
+    md, dtypes = prepared[:2]
+    md = md.assign(cat_1=md['cat_1'].astype('category'))
+    write_cache(str(tmp_path), metadata_fp, md, dtypes, ('params',))
+    cached_md, cached_dtypes = read_cache(str(tmp_path), metadata_fp, ('params',))
+    pd.testing.assert_frame_equal(cached_md, md)
+    assert cached_dtypes == dtypes
+    # other parameters: other key
+    assert read_cache(str(tmp_path), metadata_fp, ('other',)) == (None, None)
+
+
+@pytest.mark.parametrize('aggregate', [False, True])
+def test_figures_cache_round_trip(tmp_path, prepared, aggregate):
+    md, dtypes, numerical, stratas = prepared
+    logs = []
+    figures = get_figures(metadata_fp, md, stratas, numerical, 100,
+                          logs, aggregate, seed=1)
+    write_figures_cache(str(tmp_path), metadata_fp, figures, logs, dtypes)
+    cached_figures, cached_logs, cached_dtypes = read_figures_cache(
+        str(tmp_path), metadata_fp)
+    assert len(cached_figures) == len(figures)
+    for figure, cached_figure in zip(figures, cached_figures):
+        assert cached_figure[0] == figure[0]
+        pd.testing.assert_frame_equal(cached_figure[1], figure[1])
+        if aggregate:
+            pd.testing.assert_frame_equal(cached_figure[2], figure[2])
+        else:
+            assert cached_figure[2] is None
+    assert cached_logs == [list(x) for x in logs]
+    assert cached_dtypes == dtypes
+
+
+@pytest.mark.parametrize('content', [
+    b'not a npz file',
+    pickle.dumps({'md': np.arange(3)}),
+])
+def test_unreadable_cache_miss(tmp_path, prepared, content):
+    md, dtypes = prepared[:2]
+    write_cache(str(tmp_path), metadata_fp, md, dtypes)
+    with open('%s/%s-md.npz' % (tmp_path, get_cache_key(metadata_fp)), 'wb') as o:
+        o.write(content)
+    assert read_cache(str(tmp_path), metadata_fp) == (None, None)
+
+
+def test_pickled_array_cache_miss(tmp_path, prepared):
+    md, dtypes = prepared[:2]
+    write_cache(str(tmp_path), metadata_fp, md, dtypes)
+    # object arrays can only be loaded by unpickling
+    np.savez('%s/%s-md.npz' % (tmp_path, get_cache_key(metadata_fp)),
+             block=np.array([{'a': 1}], dtype=object))
+    assert read_cache(str(tmp_path), metadata_fp) == (None, None)
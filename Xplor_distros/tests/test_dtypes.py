@@ -0,0 +1,42 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Xplor_distros._xplor_dtypes import (
+    check_dtype_object, get_dtypes_final, get_dtypes_init)
+
+
+@pytest.mark.parametrize('factors, d_type', [
+    (['1.5', '2'], ['object', 'float']),
+    (['NaN', '1.5'], ['object', 'float']),
+    (['1_000', '2'], ['object', 'float']),
+    (['Infinity', '-inf', '1e5'], ['object', 'float']),
+    (['nan', np.nan, '3'], ['object', 'float']),
+    (['True', 'Falsw'], ['object', 'object']),
+    (['abc', 'def'], ['object', 'object']),
+    (['abc', '1_000'], ['object', 'check']),
+    (['abc', 'NaN'], ['object', 'check']),
+    (['abc', np.nan], ['object', 'check']),
+])
+def test_check_dtype_object(factors, d_type):
+    # same classification as python's float() on each factor
+    assert check_dtype_object(pd.Series(factors, dtype=object)) == d_type
+
+
+def test_get_dtypes_final_float_strings():
+    md = pd.DataFrame({
+        'sample_name': ['a', 'b', 'c'],
+        'var': pd.Series(['1_000', 'NaN', 'missing'], dtype=object)})
+    dtypes_final = get_dtypes_final(md, get_dtypes_init(md))
+    assert dtypes_final == {'var': 'float'}
+    assert md['var'].dtype == 'float64'
+    assert md['var'].iloc[0] == 1000.
+    assert md['var'].iloc[1:].isna().all()
@@ -0,0 +1,64 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2020, Franck Lejzerowicz.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+import pytest
+from os.path import dirname, join
+
+from Xplor_distros._xplor_sketch import (
+    init_moments, get_chunk_moments, merge_moments, get_stats_sketches)
+from Xplor_distros._xplor_summary import summarize
+
+metadata_fp = join(dirname(__file__), 'metadata', 'metadata.tsv')
+
+
+@pytest.mark.parametrize('chunksize', [None, 50])
+def test_approx_summary(chunksize):
+    # less values per factor than the sketches size: exact medians too
+    params = dict(stratify=('cat_1', 'cat_2'), chunksize=chunksize, seed=1)
+    exact = summarize((metadata_fp,), **params)
+    approx = summarize((metadata_fp,), approx=True, **params)
+    keys = ['path', 'strata', 'factor', 'variable']
+    exact = exact.sort_values(keys).reset_index(drop=True)
+    approx = approx.sort_values(keys).reset_index(drop=True)
+    assert not exact.empty
+    pd.testing.assert_frame_equal(exact[keys], approx[keys])
+    assert (exact['count'].to_numpy() == approx['count'].to_numpy()).all()
+    for column in ['mean', 'std', 'median', 'skewness']:
+        np.testing.assert_allclose(approx[column].to_numpy(dtype=float),
+                                   exact[column].to_numpy(dtype=float),
+                                   rtol=1e-10, atol=1e-12)
+
+
+def test_merge_moments():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(size=(1000, 3))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    values[:, 2] = np.nan
+    merged = init_moments(3)
+    for chunk in np.array_split(values, [10, 11, 400, 999]):
+        merged = merge_moments(merged, get_chunk_moments(chunk))
+    whole = get_chunk_moments(values)
+    for moment in ['n', 'mean', 'm2', 'm3']:
+        np.testing.assert_allclose(merged[moment], whole[moment], rtol=1e-10)
+
+
+def test_get_stats_sketches_no_chunk():
+    stats = get_stats_sketches([], {'no_stratification': []}, ['num_1'])
+    assert stats.empty
+    assert stats.columns.tolist() == ['strata', 'factor', 'variable', 'count',
+                                      'mean', 'std', 'median', 'skewness']
+
+
+def test_get_stats_sketches_mixed_factors():
+    chunk = pd.DataFrame({'num': [1., 2., 3., 4.],
+                          'strata': pd.Series([1, 'a', 1, 'a'], dtype=object)})
+    stats = get_stats_sketches([chunk], {'strata': ['strata']}, ['num'])
+    assert stats['factor'].tolist() == [1, 'a']
+    assert stats['mean'].tolist() == [2., 3.]
@@ -13,7 +13,7 @@ classes = """
     License :: OSI Approved :: BSD License
     Topic :: Scientific/Engineering
     Topic :: Scientific/Engineering :: Bio-Informatics
-    Programming Language :: Python :: 3.6
+    Programming Language :: Python :: 3.7
     Programming Language :: Python :: 3 :: Only
     Operating System :: Unix
     Operating System :: POSIX
@@ -57,8 +57,7 @@ setup(
         'numpy >= 1.12.1',
         'scipy >= 0.19.1',
         'pandas >= 0.10.0',
-        'altair >= 3.2.0',
-        "matplotlib"
+        'altair >= 3.2.0'
     ],
     classifiers=classifiers,
     entry_points={'console_scripts': standalone},
@@ -66,5 +65,5 @@ setup(
         'Xplor_distros': ['tests/*/*'],
     },
     include_package_data=True,
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )